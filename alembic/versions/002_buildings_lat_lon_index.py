@@ -0,0 +1,22 @@
+"""add composite index on building coordinates
+
+Revision ID: 002
+Revises: 001
+Create Date: 2024-02-01 12:00:00.000000
+
+"""
+from alembic import op
+
+
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_buildings_lat_lon', 'buildings', ['latitude', 'longitude'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_buildings_lat_lon', table_name='buildings')
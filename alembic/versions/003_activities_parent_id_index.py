@@ -0,0 +1,22 @@
+"""add index on activities.parent_id
+
+Revision ID: 003
+Revises: 002
+Create Date: 2024-02-05 12:00:00.000000
+
+"""
+from alembic import op
+
+
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_activities_parent_id'), 'activities', ['parent_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_activities_parent_id'), table_name='activities')
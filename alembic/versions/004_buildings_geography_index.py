@@ -0,0 +1,27 @@
+"""add PostGIS geography index on building coordinates
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-02-12 12:00:00.000000
+
+"""
+from alembic import op
+
+
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    # Expression must match app.core.geo_queries.building_geography
+    op.execute(
+        "CREATE INDEX ix_buildings_geog ON buildings USING gist "
+        "(geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)))"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_buildings_geog")
@@ -0,0 +1,26 @@
+"""add trigram index on organizations.name
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-02-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_organizations_name_trgm', 'organizations', ['name'],
+        unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_organizations_name_trgm', table_name='organizations')
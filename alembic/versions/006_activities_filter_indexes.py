@@ -0,0 +1,33 @@
+"""add filter indexes on activities
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-02-26 12:00:00.000000
+
+"""
+from alembic import op
+
+
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The composite index covers every lookup the single-column one served
+    op.create_index(
+        'ix_activities_parent_id_level', 'activities', ['parent_id', 'level'], unique=False
+    )
+    op.drop_index('ix_activities_parent_id', table_name='activities')
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_activities_name_trgm', 'activities', ['name'],
+        unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activities_name_trgm', table_name='activities')
+    op.create_index('ix_activities_parent_id', 'activities', ['parent_id'], unique=False)
+    op.drop_index('ix_activities_parent_id_level', table_name='activities')
@@ -0,0 +1,26 @@
+"""add GiST index on building points
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-03-04 12:00:00.000000
+
+"""
+from alembic import op
+
+
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Expression must match app.core.geo_queries.building_point
+    op.execute(
+        "CREATE INDEX ix_buildings_point ON buildings USING gist "
+        "(point(longitude, latitude))"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_buildings_point")
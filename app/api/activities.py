@@ -1,5 +1,9 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
+from typing import Any, List, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi_cache.decorator import cache
+from pydantic import TypeAdapter
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
@@ -7,42 +11,99 @@ from app.core.auth import verify_api_key
 from app.models.models import Activity
 from app.schemas.schemas import ActivitySchema, ActivityTreeSchema
 
-router = APIRouter(prefix="/activities", tags=["activities"])
+router = APIRouter(
+    prefix="/activities", tags=["activities"], dependencies=[Depends(verify_api_key)]
+)
 
+_activities_adapter = TypeAdapter(List[ActivitySchema])
 
-def build_activity_tree(activities: List[Activity]) -> List[ActivityTreeSchema]:
-    """Build a hierarchical tree structure from flat activity list."""
-    activity_map = {activity.id: ActivityTreeSchema.from_orm(activity) for activity in activities}
 
-    for activity in activity_map.values():
-        activity.children = []
+def build_activity_tree(activities: Sequence[Any]) -> List[ActivityTreeSchema]:
+    """Build a hierarchical tree structure from flat activity rows (id, name, parent_id, level)."""
+    # Rows come straight from the database, so validation is skipped
+    activity_map = {
+        activity.id: ActivityTreeSchema.model_construct(
+            id=activity.id,
+            name=activity.name,
+            parent_id=activity.parent_id,
+            level=activity.level,
+            children=[]
+        )
+        for activity in activities
+    }
 
     root_activities = []
     for activity in activities:
         activity_schema = activity_map[activity.id]
         if activity.parent_id is None:
             root_activities.append(activity_schema)
-        else:
-            if activity.parent_id in activity_map:
-                activity_map[activity.parent_id].children.append(activity_schema)
+        elif activity.parent_id in activity_map:
+            activity_map[activity.parent_id].children.append(activity_schema)
 
     return root_activities
 
 
 @router.get("", response_model=List[ActivitySchema] | List[ActivityTreeSchema])
-async def get_activities(
+@cache(expire=3600, namespace="activities")
+def get_activities(
+    name: Optional[str] = Query(None, description="Search by name (partial match)"),
+    parent_id: Optional[int] = Query(None, description="Filter by parent activity ID"),
+    level: Optional[int] = Query(None, description="Filter by hierarchy level (1-3)"),
+    ids: Optional[List[int]] = Query(None, description="Fetch activities by ID (repeatable)"),
     include_tree: Optional[bool] = Query(False, description="Return nested tree structure"),
-    db: Session = Depends(get_db),
-    api_key: str = Depends(verify_api_key)
+    db: Session = Depends(get_db)
 ):
     """
-    Get all activities.
+    Get activities with optional filtering:
+    - name: Partial text search
+    - parent_id: Direct children of an activity
+    - level: Hierarchy level
+    - ids: Several activities in one request, e.g. ?ids=1&ids=3
     - include_tree=false: Returns flat list
-    - include_tree=true: Returns hierarchical tree structure
+    - include_tree=true: Returns hierarchical tree structure of the matching activities
+
+    Responses are cached for up to an hour with an ETag derived from the cached body,
+    a matching If-None-Match gets 304 Not Modified. Cached entries are only dropped
+    by invalidate_activity_caches() (scripts/seed_data.py calls it); call it
+    after any other change to activities.
     """
-    activities = db.query(Activity).all()
+    # Plain column rows instead of ORM instances, no identity map bookkeeping
+    query = select(Activity.id, Activity.name, Activity.parent_id, Activity.level)
+
+    if name:
+        query = query.where(Activity.name.ilike(f"%{name}%"))
+
+    if parent_id is not None:
+        query = query.where(Activity.parent_id == parent_id)
+
+    if level is not None:
+        query = query.where(Activity.level == level)
+
+    if ids:
+        query = query.where(Activity.id.in_(ids))
+
+    activities = db.execute(query).all()
 
     if include_tree:
         return build_activity_tree(activities)
 
-    return activities
+    return _activities_adapter.validate_python(activities, from_attributes=True)
+
+
+@router.get("/{activity_id}", response_model=ActivitySchema)
+def get_activity(
+    activity_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a specific activity."""
+    # The parent is exposed as parent_id only, so a single row is all it takes;
+    # no parent or children relationships are loaded
+    activity = db.execute(
+        select(Activity.id, Activity.name, Activity.parent_id, Activity.level)
+        .where(Activity.id == activity_id)
+    ).first()
+
+    if not activity:
+        raise HTTPException(status_code=404, detail="Activity not found")
+
+    return ActivitySchema.model_validate(activity, from_attributes=True)
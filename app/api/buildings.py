@@ -1,20 +1,127 @@
-from typing import List
-from fastapi import APIRouter, Depends
+from typing import List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi_cache.decorator import cache
+from pydantic import TypeAdapter
+from sqlalchemy import ColumnElement, select
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.core.auth import verify_api_key
+from app.core.cache import JSONResponseCoder
+from app.core.geo_queries import bbox_clauses, radius_clauses
+from app.core.geo_utils_fast import radius_mask
 from app.models.models import Building
 from app.schemas.schemas import BuildingSchema
 
-router = APIRouter(prefix="/buildings", tags=["buildings"])
+router = APIRouter(
+    prefix="/buildings", tags=["buildings"], dependencies=[Depends(verify_api_key)]
+)
+
+_buildings_adapter = TypeAdapter(List[BuildingSchema])
 
 
 @router.get("", response_model=List[BuildingSchema])
-async def get_buildings(
-    db: Session = Depends(get_db),
-    api_key: str = Depends(verify_api_key)
+@cache(expire=3600, namespace="buildings", coder=JSONResponseCoder)
+def get_buildings(
+    address: Optional[str] = Query(None, description="Search by address (partial match)"),
+    postcode: Optional[str] = Query(None, description="Filter by postcode"),
+    cadastral_number: Optional[str] = Query(None, description="Cadastral number (partial match)"),
+    lat: Optional[float] = Query(None, description="Latitude for radius search"),
+    lon: Optional[float] = Query(None, description="Longitude for radius search"),
+    radius: Optional[float] = Query(None, description="Radius in meters"),
+    lat_min: Optional[float] = Query(None, description="Min latitude for bounding box"),
+    lat_max: Optional[float] = Query(None, description="Max latitude for bounding box"),
+    lon_min: Optional[float] = Query(None, description="Min longitude for bounding box"),
+    lon_max: Optional[float] = Query(None, description="Max longitude for bounding box"),
+    db: Session = Depends(get_db)
 ):
-    """Get all buildings."""
-    buildings = db.query(Building).all()
-    return buildings
+    """
+    Get buildings with optional filtering:
+    - address: Partial text search
+    - postcode: Exact match
+    - cadastral_number: Partial text search
+    - lat, lon, radius: Geo radius search
+    - lat_min, lat_max, lon_min, lon_max: Geo bounding box search
+
+    Responses are cached; clear the "buildings" cache namespace when buildings change
+    (scripts/seed_data.py does after re-seeding).
+    """
+    dialect_name = db.get_bind().dialect.name
+    bbox_filter: List[ColumnElement[bool]] = []
+    if lat_min is not None and lat_max is not None and lon_min is not None and lon_max is not None:
+        if lat_min > lat_max or lon_min > lon_max:
+            # An inverted box matches nothing, skip the database round trip
+            return Response(content=b"[]", media_type="application/json")
+        bbox_filter = bbox_clauses(dialect_name, lat_min, lat_max, lon_min, lon_max)
+
+    # Select only the columns of the response schema, skipping ORM instance construction
+    query = select(
+        Building.id,
+        Building.address,
+        Building.postcode,
+        Building.cadastral_number,
+        Building.latitude,
+        Building.longitude
+    )
+
+    if address:
+        query = query.where(Building.address.ilike(f"%{address}%"))
+
+    if postcode:
+        query = query.where(Building.postcode == postcode)
+
+    if cadastral_number:
+        query = query.where(Building.cadastral_number.ilike(f"%{cadastral_number}%"))
+
+    if bbox_filter:
+        query = query.where(*bbox_filter)
+
+    # Center and radius of a search whose SQL candidates still need refining
+    refine: Optional[Tuple[float, float, float]] = None
+    if lat is not None and lon is not None and radius is not None:
+        # ST_DWithin on the GiST geography index with PostGIS, otherwise a
+        # bounding box whose candidates are refined by distance below
+        clauses, exact = radius_clauses(dialect_name, lat, lon, radius)
+        query = query.where(*clauses)
+        if not exact:
+            refine = (lat, lon, radius)
+
+    rows = db.execute(query).mappings().all()
+
+    if refine is not None and rows:
+        count = len(rows)
+        lats = np.fromiter((row["latitude"] for row in rows), dtype=np.float64, count=count)
+        lons = np.fromiter((row["longitude"] for row in rows), dtype=np.float64, count=count)
+        center_lat, center_lon, radius_m = refine
+        keep = radius_mask(center_lat, center_lon, lats, lons, radius_m)
+        rows = [rows[i] for i in np.flatnonzero(keep).tolist()]
+
+    # Validate and serialize the whole list in one pydantic-core call
+    buildings = _buildings_adapter.validate_python(rows)
+    return Response(content=_buildings_adapter.dump_json(buildings), media_type="application/json")
+
+
+@router.get("/{building_id}", response_model=BuildingSchema)
+def get_building(
+    building_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a specific building."""
+    building = db.execute(
+        select(
+            Building.id,
+            Building.address,
+            Building.postcode,
+            Building.cadastral_number,
+            Building.latitude,
+            Building.longitude
+        )
+        .where(Building.id == building_id)
+    ).first()
+
+    if not building:
+        raise HTTPException(status_code=404, detail="Building not found")
+
+    return BuildingSchema.model_validate(building, from_attributes=True)
@@ -1,26 +1,102 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from fastapi_cache.decorator import cache
+from pydantic import TypeAdapter
+from sqlalchemy import ColumnElement, Connection, event, exists
+from sqlalchemy.orm import (
+    Mapper, Session, contains_eager, joinedload, object_session, selectinload
+)
 
 from app.core.database import get_db
 from app.core.auth import verify_api_key
-from app.core.geo_utils import haversine_distance, is_in_bounding_box
-from app.models.models import Organization, Building, Activity
+from app.core.cache import JSONResponseCoder, clear_cache
+from app.core.geo_queries import bbox_clauses, radius_clauses
+from app.core.geo_utils_fast import radius_mask
+from app.models.models import Organization, Building, Activity, organization_activity
 from app.schemas.schemas import OrganizationSchema, OrganizationDetailSchema
 
-router = APIRouter(prefix="/organizations", tags=["organizations"])
+router = APIRouter(
+    prefix="/organizations", tags=["organizations"], dependencies=[Depends(verify_api_key)]
+)
+
+_organizations_adapter = TypeAdapter(List[OrganizationDetailSchema])
+_organization_adapter = TypeAdapter(OrganizationDetailSchema)
+
+
+# Descendant IDs per (activity_id, tree version); activities change rarely.
+# ORM writes to activities bump the version once they commit (listeners below).
+# The cache lives in process memory: with several workers each one keeps its own
+# copy, so a write in one process does not invalidate the others. Bulk or raw SQL
+# writers must call invalidate_activity_caches() and multi-worker deployments
+# still need a restart (or a shared cache) after changing the activity tree.
+_DESCENDANT_CACHE: Dict[Tuple[int, int], Tuple[int, ...]] = {}
+_TREE_VERSION = 0
+
+
+def bump_activity_version() -> None:
+    """Invalidate cached descendant lookups of this process."""
+    global _TREE_VERSION
+    _TREE_VERSION += 1
+    _DESCENDANT_CACHE.clear()
+
+
+@event.listens_for(Activity, "after_insert")
+@event.listens_for(Activity, "after_update")
+@event.listens_for(Activity, "after_delete")
+def _flag_activity_change(mapper: Mapper, connection: Connection, target: Activity) -> None:
+    """Remember that the session changed the tree; lookups are dropped on commit."""
+    session = object_session(target)
+    if session is not None:
+        session.info["activities_changed"] = True
 
 
-def get_activity_with_descendants(db: Session, activity_id: int) -> List[int]:
-    """Get an activity and all its descendant activity IDs."""
-    activity = db.query(Activity).filter(Activity.id == activity_id).first()
-    if not activity:
-        return []
-    return activity.get_all_descendants()
+@event.listens_for(Session, "after_commit")
+def _bump_on_activity_commit(session: Session) -> None:
+    # Bumping at flush time would let a concurrent request cache the
+    # still-committed old tree under the new version
+    if session.info.pop("activities_changed", False):
+        bump_activity_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_activity_change(session: Session) -> None:
+    session.info.pop("activities_changed", None)
+
+
+async def invalidate_activity_caches() -> None:
+    """
+    Invalidate everything derived from the activity tree; call after any change to activities.
+    Drops the descendant lookups and the cached /activities and /organizations
+    responses, the latter depend on the tree through the activity_id filter.
+    """
+    bump_activity_version()
+    await clear_cache(namespace="activities")
+    await clear_cache(namespace="organizations")
+
+
+def get_activity_with_descendants(db: Session, activity_id: int) -> Tuple[int, ...]:
+    """
+    Get an activity and all its descendant activity IDs in a single recursive query.
+    Results are cached until invalidate_activity_caches() is called.
+    """
+    key = (activity_id, _TREE_VERSION)
+    cached = _DESCENDANT_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    activity_ids = tuple(db.execute(Activity.subtree_ids_select(activity_id)).scalars())
+
+    # Unknown IDs are not cached so arbitrary requests cannot grow the cache
+    if activity_ids:
+        _DESCENDANT_CACHE[key] = activity_ids
+    return activity_ids
 
 
 @router.get("", response_model=List[OrganizationDetailSchema])
-async def get_organizations(
+@cache(expire=3600, namespace="organizations", coder=JSONResponseCoder)
+def get_organizations(
     building_id: Optional[int] = Query(None, description="Filter by building ID"),
     activity_id: Optional[int] = Query(None, description="Filter by activity (includes children)"),
     name: Optional[str] = Query(None, description="Search by name (partial match)"),
@@ -31,8 +107,7 @@ async def get_organizations(
     lat_max: Optional[float] = Query(None, description="Max latitude for bounding box"),
     lon_min: Optional[float] = Query(None, description="Min longitude for bounding box"),
     lon_max: Optional[float] = Query(None, description="Max longitude for bounding box"),
-    db: Session = Depends(get_db),
-    api_key: str = Depends(verify_api_key)
+    db: Session = Depends(get_db)
 ):
     """
     Get organizations with optional filtering:
@@ -41,10 +116,23 @@ async def get_organizations(
     - name: Partial text search
     - lat, lon, radius: Geo radius search
     - lat_min, lat_max, lon_min, lon_max: Geo bounding box search
+
+    Responses are cached; clear the "organizations" cache namespace when organizations
+    change (scripts/seed_data.py does after re-seeding).
     """
+    dialect_name = db.get_bind().dialect.name
+    bbox_filter: List[ColumnElement[bool]] = []
+    if lat_min is not None and lat_max is not None and lon_min is not None and lon_max is not None:
+        if lat_min > lat_max or lon_min > lon_max:
+            # An inverted box matches nothing, skip the descendant lookup and the query
+            return Response(content=b"[]", media_type="application/json")
+        bbox_filter = bbox_clauses(dialect_name, lat_min, lat_max, lon_min, lon_max)
+
+    # Building is already joined for filtering, so populate the relationship from
+    # that join; activities are many-to-many and are loaded in one extra IN query.
     query = db.query(Organization).join(Building).options(
-        joinedload(Organization.building),
-        joinedload(Organization.activities)
+        contains_eager(Organization.building),
+        selectinload(Organization.activities)
     )
 
     if building_id is not None:
@@ -52,48 +140,63 @@ async def get_organizations(
 
     if activity_id is not None:
         activity_ids = get_activity_with_descendants(db, activity_id)
-        if activity_ids:
-            query = query.filter(Organization.activities.any(Activity.id.in_(activity_ids)))
+        # Semi-join on the association table alone; activities need not be joined in
+        query = query.filter(
+            exists().where(
+                organization_activity.c.organization_id == Organization.id,
+                organization_activity.c.activity_id.in_(activity_ids),
+            )
+        )
 
     if name:
         query = query.filter(Organization.name.ilike(f"%{name}%"))
 
-    organizations = query.all()
+    if bbox_filter:
+        query = query.filter(*bbox_filter)
 
-    # Apply geo filters if provided
+    # Center and radius of a search whose SQL candidates still need refining
+    refine: Optional[Tuple[float, float, float]] = None
     if lat is not None and lon is not None and radius is not None:
-        filtered_orgs = []
-        for org in organizations:
-            distance = haversine_distance(lat, lon, org.building.latitude, org.building.longitude)
-            if distance <= radius:
-                filtered_orgs.append(org)
-        organizations = filtered_orgs
+        # Index-backed radius filter in SQL; unless it is exact (PostGIS),
+        # the distance check below refines the bounding-box candidates
+        clauses, exact = radius_clauses(dialect_name, lat, lon, radius)
+        query = query.filter(*clauses)
+        if not exact:
+            refine = (lat, lon, radius)
 
-    if lat_min is not None and lat_max is not None and lon_min is not None and lon_max is not None:
-        organizations = [
-            org for org in organizations
-            if is_in_bounding_box(
-                org.building.latitude, org.building.longitude,
-                lat_min, lat_max, lon_min, lon_max
-            )
-        ]
+    organizations = query.all()
+
+    if refine is not None and organizations:
+        count = len(organizations)
+        lats = np.fromiter((org.building.latitude for org in organizations), dtype=np.float64, count=count)
+        lons = np.fromiter((org.building.longitude for org in organizations), dtype=np.float64, count=count)
+        center_lat, center_lon, radius_m = refine
+        keep = radius_mask(center_lat, center_lon, lats, lons, radius_m)
+
+        # Index back into the ORM list instead of iterating NumPy bools in Python
+        organizations = [organizations[i] for i in np.flatnonzero(keep).tolist()]
 
-    return organizations
+    # Validate and serialize the whole list in one pydantic-core call
+    payload = _organizations_adapter.validate_python(organizations, from_attributes=True)
+    return Response(content=_organizations_adapter.dump_json(payload), media_type="application/json")
 
 
 @router.get("/{organization_id}", response_model=OrganizationDetailSchema)
-async def get_organization(
+def get_organization(
     organization_id: int,
-    db: Session = Depends(get_db),
-    api_key: str = Depends(verify_api_key)
+    db: Session = Depends(get_db)
 ):
     """Get detailed information about a specific organization."""
+    # Many-to-one building is joined; many-to-many activities use a separate IN
+    # query, joining them would multiply rows by the number of activities
     organization = db.query(Organization).options(
         joinedload(Organization.building),
-        joinedload(Organization.activities)
+        selectinload(Organization.activities)
     ).filter(Organization.id == organization_id).first()
 
     if not organization:
         raise HTTPException(status_code=404, detail="Organization not found")
 
-    return organization
+    # Dump straight to JSON bytes, skipping FastAPI's jsonable_encoder pass
+    detail = _organization_adapter.validate_python(organization, from_attributes=True)
+    return Response(content=_organization_adapter.dump_json(detail), media_type="application/json")
@@ -1,9 +1,21 @@
+import hmac
+
 from fastapi import Header, HTTPException, status
 from app.core.config import settings
 
+# Settings are fixed for the life of the process, encode the key once
+_API_KEY_BYTES = settings.API_KEY.encode()
+
 
 async def verify_api_key(x_api_key: str = Header(...)):
-    if x_api_key != settings.API_KEY:
+    """
+    Check the X-API-Key header.
+    Routers declare it as a router-level dependency, so it runs before
+    the endpoint's own dependencies and a rejected request never opens
+    a database session.
+    """
+    # Constant-time comparison, the response time must not leak the key
+    if not hmac.compare_digest(x_api_key.encode(), _API_KEY_BYTES):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid API Key"
@@ -0,0 +1,118 @@
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.coder import Coder
+from fastapi_cache.types import Backend
+from redis import asyncio as aioredis
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "orgdir"
+
+
+def request_key_builder(
+    func: Callable[..., Any],
+    namespace: str = "",
+    *,
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args: Tuple[Any, ...] = (),
+    kwargs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Build a cache key from the endpoint and the request URL.
+    Injected dependencies (DB session, API key) are ignored so that
+    identical requests share one cache entry.
+    """
+    path = request.url.path if request else ""
+    query = sorted(request.query_params.multi_items()) if request else []
+    return f"{namespace}:{func.__module__}:{func.__name__}:{path}:{query}"
+
+
+class JSONResponseCoder(Coder):
+    """
+    Cache endpoints that return an already serialized JSON Response.
+    The body bytes are stored as is. A returned Response bypasses FastAPI's
+    header merging, so the weak ETag the cache decorator derives from the
+    stored bytes (and answers If-None-Match with) is set on it here.
+    """
+
+    @classmethod
+    def encode(cls, value: Response) -> bytes:
+        body = bytes(value.body)
+        value.headers["ETag"] = f"W/{hash(body)}"
+        return body
+
+    @classmethod
+    def decode(cls, value: bytes) -> Response:
+        return Response(
+            content=value, media_type="application/json", headers={"ETag": f"W/{hash(value)}"}
+        )
+
+
+def init_cache() -> None:
+    """
+    Configure the response cache.
+    Caching is enabled only when REDIS_URL is set; otherwise cached
+    endpoints transparently hit the database on every request.
+    """
+    enabled = bool(settings.REDIS_URL)
+    backend: Backend
+    if enabled:
+        backend = RedisBackend(aioredis.from_url(settings.REDIS_URL))
+    else:
+        backend = InMemoryBackend()
+
+    FastAPICache.init(
+        backend,
+        prefix=CACHE_PREFIX,
+        key_builder=request_key_builder,
+        enable=enabled,
+    )
+
+
+async def clear_cache(namespace: Optional[str] = None) -> None:
+    """
+    Drop cached responses, all of them or one namespace only.
+    A no-op when caching is disabled; an unreachable backend is logged, not raised.
+    """
+    if not FastAPICache.get_enable():
+        return
+    try:
+        await FastAPICache.clear(namespace=namespace)
+    except Exception:
+        logger.warning("Could not clear the response cache", exc_info=True)
+
+
+class DocsCacheControlMiddleware:
+    """
+    Let browsers and proxies cache the API documentation.
+    The OpenAPI schema only changes on deploy; FastAPI already builds it once
+    per process, this saves clients from re-fetching it and the docs pages.
+    Plain ASGI middleware, other requests pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Tuple[str, ...], max_age: int = 3600) -> None:
+        self.app = app
+        self.paths = frozenset(paths)
+        self.header = (b"cache-control", f"public, max-age={max_age}".encode())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_control(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message["headers"] = [*message.get("headers", []), self.header]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_control)
@@ -1,9 +1,12 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     API_KEY: str
+    REDIS_URL: Optional[str] = None
 
     class Config:
         env_file = ".env"
@@ -11,6 +11,12 @@ Base = declarative_base()
 
 
 def get_db():
+    """
+    Yield a blocking SQLAlchemy session.
+    Endpoints using it are plain `def` functions: FastAPI runs them in its
+    threadpool, so concurrent requests overlap their database round trips
+    instead of blocking the event loop one after another.
+    """
     db = SessionLocal()
     try:
         yield db
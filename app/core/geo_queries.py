@@ -0,0 +1,65 @@
+from typing import List, Tuple
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.geo_utils import calculate_bounding_box
+from app.models.models import Building
+
+
+def building_geography() -> ColumnElement:
+    """
+    PostGIS geography point of a building.
+    Must stay identical to the expression of the ix_buildings_geog index.
+    """
+    return func.geography(
+        func.ST_SetSRID(
+            func.ST_MakePoint(Building.longitude, Building.latitude), literal_column("4326")
+        )
+    )
+
+
+def radius_clauses(dialect_name: str, lat: float, lon: float,
+                   radius: float) -> Tuple[List[ColumnElement], bool]:
+    """
+    Build WHERE clauses selecting buildings within `radius` meters of a point.
+    Returns the clauses and whether they are exact. On PostgreSQL this is
+    ST_DWithin over the GiST-indexed geography; elsewhere it is the enclosing
+    bounding box, and callers must refine candidates by distance.
+    """
+    if dialect_name == "postgresql":
+        center = func.geography(func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326))
+        # Spherical distance, consistent with haversine_distance
+        return [func.ST_DWithin(building_geography(), center, radius, False)], True
+
+    bbox = calculate_bounding_box(lat, lon, radius)
+    return [
+        Building.latitude.between(bbox["lat_min"], bbox["lat_max"]),
+        Building.longitude.between(bbox["lon_min"], bbox["lon_max"])
+    ], False
+
+
+def building_point() -> ColumnElement:
+    """
+    Native PostgreSQL point (longitude, latitude) of a building.
+    Must stay identical to the expression of the ix_buildings_point index.
+    """
+    return func.point(Building.longitude, Building.latitude)
+
+
+def bbox_clauses(dialect_name: str, lat_min: float, lat_max: float,
+                 lon_min: float, lon_max: float) -> List[ColumnElement[bool]]:
+    """
+    Build WHERE clauses selecting buildings inside a lat/lon bounding box.
+    On PostgreSQL a containment test on the GiST-indexed point drives the
+    scan; the BETWEEN ranges are kept because box() silently reorders
+    inverted corners, and an inverted box must match nothing.
+    """
+    clauses: List[ColumnElement[bool]] = [
+        Building.latitude.between(lat_min, lat_max),
+        Building.longitude.between(lon_min, lon_max)
+    ]
+    if dialect_name == "postgresql":
+        box = func.box(func.point(lon_min, lat_min), func.point(lon_max, lat_max))
+        clauses.insert(0, building_point().op("<@")(box))
+    return clauses
@@ -1,5 +1,11 @@
 import math
 
+import numpy as np
+
+# Below this radius (meters) the equirectangular approximation stays within
+# a meter of the haversine distance at mid latitudes
+EQUIRECTANGULAR_MAX_RADIUS = 50_000
+
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -22,6 +28,47 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
+def haversine_distance_batch(lat0: float, lon0: float,
+                             lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Calculate the great circle distance from one point to many points
+    (specified in decimal degrees) in a single vectorized pass.
+    Returns an array of distances in meters.
+    """
+    R = 6371000  # Earth's radius in meters
+
+    lat0_rad = math.radians(lat0)
+    lats_rad = np.radians(lats)
+    delta_lat = lats_rad - lat0_rad
+    delta_lon = np.radians(lons) - math.radians(lon0)
+
+    a = (np.sin(delta_lat / 2) ** 2 +
+         math.cos(lat0_rad) * np.cos(lats_rad) *
+         np.sin(delta_lon / 2) ** 2)
+
+    distances: np.ndarray = 2 * R * np.arcsin(np.sqrt(a))
+    return distances
+
+
+def equirectangular_distance_batch(lat0: float, lon0: float,
+                                   lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Approximate distances from one point to many points (specified in
+    decimal degrees) with the equirectangular projection at the mean latitude.
+    Cheaper than haversine and accurate for city-scale distances.
+    Returns an array of distances in meters.
+    """
+    R = 6371000  # Earth's radius in meters
+
+    lat0_rad = math.radians(lat0)
+    lats_rad = np.radians(lats)
+    dx = (np.radians(lons) - math.radians(lon0)) * np.cos((lats_rad + lat0_rad) / 2)
+    dy = lats_rad - lat0_rad
+
+    distances: np.ndarray = R * np.hypot(dx, dy)
+    return distances
+
+
 def is_in_bounding_box(lat: float, lon: float,
                        lat_min: float, lat_max: float,
                        lon_min: float, lon_max: float) -> bool:
@@ -50,9 +97,19 @@ def calculate_bounding_box(lat: float, lon: float, radius: float) -> dict:
     # Calculate longitude boundaries (adjust for latitude)
     # At higher latitudes, degrees of longitude represent shorter distances
     lon_rad = math.radians(lon)
-    delta_lon = math.asin(math.sin(radius_rad) / math.cos(lat_rad))
-    lon_min = math.degrees(lon_rad - delta_lon)
-    lon_max = math.degrees(lon_rad + delta_lon)
+    cos_lat = math.cos(lat_rad)
+    if lat_min <= -90 or lat_max >= 90 or math.sin(radius_rad) >= cos_lat:
+        # The circle contains a pole: every longitude is within reach
+        lat_min = max(lat_min, -90.0)
+        lat_max = min(lat_max, 90.0)
+        lon_min, lon_max = -180.0, 180.0
+    else:
+        delta_lon = math.asin(math.sin(radius_rad) / cos_lat)
+        lon_min = math.degrees(lon_rad - delta_lon)
+        lon_max = math.degrees(lon_rad + delta_lon)
+        if lon_min < -180 or lon_max > 180:
+            # The box crosses the antimeridian, fall back to the full range
+            lon_min, lon_max = -180.0, 180.0
 
     return {
         "lat_min": lat_min,
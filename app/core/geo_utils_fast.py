@@ -0,0 +1,73 @@
+"""
+Numba-compiled geo kernels for large candidate sets.
+
+numba is optional (the "fast" extra). Without it HAS_NUMBA is False and
+haversine_mask falls back to the NumPy implementation in geo_utils.
+"""
+import math
+
+import numpy as np
+
+from app.core.geo_utils import (
+    EQUIRECTANGULAR_MAX_RADIUS,
+    equirectangular_distance_batch,
+    haversine_distance_batch,
+)
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # pragma: no cover - depends on the environment
+    HAS_NUMBA = False
+
+# Candidate count above which the compiled kernel pays off over NumPy
+NUMBA_MIN_CANDIDATES = 1024
+
+
+def _haversine_mask_loop(lat0: float, lon0: float, lats: np.ndarray,
+                         lons: np.ndarray, radius: float) -> np.ndarray:
+    """
+    Haversine within-radius check as one explicit loop, without NumPy
+    temporaries; only worth running once compiled by numba.
+    """
+    R = 6371000.0  # Earth's radius in meters
+    n = lats.shape[0]
+    out = np.empty(n, np.bool_)
+    lat0_rad = math.radians(lat0)
+    cos_lat0 = math.cos(lat0_rad)
+    for i in range(n):
+        lat_rad = math.radians(lats[i])
+        sin_dlat = math.sin((lat_rad - lat0_rad) / 2)
+        sin_dlon = math.sin(math.radians(lons[i] - lon0) / 2)
+        a = sin_dlat * sin_dlat + cos_lat0 * math.cos(lat_rad) * sin_dlon * sin_dlon
+        out[i] = 2 * R * math.asin(math.sqrt(a)) <= radius
+    return out
+
+
+if HAS_NUMBA:
+    _haversine_mask_compiled = njit(cache=True)(_haversine_mask_loop)
+
+
+def haversine_mask(lat0: float, lon0: float, lats: np.ndarray,
+                   lons: np.ndarray, radius: float) -> np.ndarray:
+    """
+    Check which points (decimal degrees) lie within `radius` meters of
+    (lat0, lon0). Runs the compiled loop when numba is installed,
+    the NumPy haversine otherwise.
+    """
+    if HAS_NUMBA:
+        return _haversine_mask_compiled(lat0, lon0, lats, lons, radius)
+    return haversine_distance_batch(lat0, lon0, lats, lons) <= radius
+
+
+def radius_mask(lat0: float, lon0: float, lats: np.ndarray,
+                lons: np.ndarray, radius: float) -> np.ndarray:
+    """
+    Check which points (decimal degrees) lie within `radius` meters of
+    (lat0, lon0), picking the cheapest kernel that is accurate enough.
+    """
+    if HAS_NUMBA and len(lats) > NUMBA_MIN_CANDIDATES:
+        return haversine_mask(lat0, lon0, lats, lons, radius)
+    if radius < EQUIRECTANGULAR_MAX_RADIUS:
+        return equirectangular_distance_batch(lat0, lon0, lats, lons) <= radius
+    return haversine_distance_batch(lat0, lon0, lats, lons) <= radius
@@ -1,10 +1,31 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
 from app.api import organizations, buildings, activities
+from app.core.cache import DocsCacheControlMiddleware, clear_cache, init_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_cache()
+    # Drop entries cached by a previous run, the data may have been re-seeded
+    await clear_cache()
+    yield
+
 
 app = FastAPI(
     title="Organization Directory System",
     description="REST API for managing organizations, buildings, and activities",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+app.add_middleware(
+    DocsCacheControlMiddleware,
+    paths=(app.openapi_url, app.docs_url, app.redoc_url)
 )
 
 app.include_router(organizations.router, prefix="/api/v1")
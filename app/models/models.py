@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, JSON
-from sqlalchemy.orm import relationship
+from typing import cast
+
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, JSON, Index, Select, select
+from sqlalchemy.orm import relationship, object_session
+from sqlalchemy.orm.exc import DetachedInstanceError
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.mutable import MutableList
 
@@ -26,6 +29,11 @@ class Building(Base):
 
     organizations = relationship("Organization", back_populates="building")
 
+    __table_args__ = (
+        # Serves the bounding-box prefilter of geo searches
+        Index('ix_buildings_lat_lon', 'latitude', 'longitude'),
+    )
+
 
 class Activity(Base):
     __tablename__ = "activities"
@@ -38,12 +46,33 @@ class Activity(Base):
     parent = relationship("Activity", remote_side=[id], backref="children")
     organizations = relationship("Organization", secondary=organization_activity, back_populates="activities")
 
+    __table_args__ = (
+        # Serves parent_id and parent_id + level filters, and the descendant CTE join
+        Index('ix_activities_parent_id_level', 'parent_id', 'level'),
+        # Trigram index lets PostgreSQL serve substring ILIKE searches on name
+        Index(
+            'ix_activities_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+    )
+
+    @classmethod
+    def subtree_ids_select(cls, activity_id: int) -> Select:
+        """Build a recursive query selecting an activity ID and all its descendant IDs."""
+        tree = select(cls.id).where(cls.id == activity_id).cte(recursive=True)
+        tree = tree.union_all(select(cls.id).join(tree, cls.parent_id == tree.c.id))
+        return select(tree.c.id)
+
     def get_all_descendants(self):
-        """Recursively get all descendant activity IDs"""
-        descendants = [self.id]
-        for child in self.children:
-            descendants.extend(child.get_all_descendants())
-        return descendants
+        """Get this activity and all descendant activity IDs in a single recursive query."""
+        session = object_session(self)
+        if session is None:
+            raise DetachedInstanceError(
+                "get_all_descendants() needs an Activity attached to a session"
+            )
+        # Typed as Column[int] on the class, on a loaded instance it holds the int
+        activity_id = cast(int, self.id)
+        return list(session.execute(self.subtree_ids_select(activity_id)).scalars())
 
 
 class Organization(Base):
@@ -57,3 +86,11 @@ class Organization(Base):
 
     building = relationship("Building", back_populates="organizations")
     activities = relationship("Activity", secondary=organization_activity, back_populates="organizations")
+
+    __table_args__ = (
+        # Trigram index lets PostgreSQL serve substring ILIKE searches on name
+        Index(
+            'ix_organizations_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+    )
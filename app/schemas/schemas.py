@@ -1,5 +1,5 @@
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 # Building Schemas
@@ -19,8 +19,7 @@ class BuildingSchema(BuildingBase):
     postcode: Optional[str] = None
     cadastral_number: Optional[str] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Activity Schemas
@@ -37,15 +36,13 @@ class ActivitySchema(ActivityBase):
     id: int
     level: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ActivityTreeSchema(ActivitySchema):
     children: List['ActivityTreeSchema'] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Organization Schemas
@@ -65,13 +62,11 @@ class OrganizationSchema(BaseModel):
     building_id: int
     phones: Optional[List[str]] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class OrganizationDetailSchema(OrganizationSchema):
     building: BuildingSchema
     activities: List[ActivitySchema] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
@@ -2,16 +2,27 @@
 Seed script to populate the database with test data.
 Run after migrations: python scripts/seed_data.py
 """
+import asyncio
 import sys
 import os
 
 sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
 
 from sqlalchemy.orm import Session
+from app.api.organizations import invalidate_activity_caches
+from app.core.cache import clear_cache, init_cache
 from app.core.database import engine, SessionLocal
 from app.models.models import Building, Activity, Organization, Base
 
 
+async def clear_response_caches():
+    """Drop cached API responses, they still list the rows deleted by the seed."""
+    init_cache()
+    await clear_cache(namespace="buildings")
+    # Also drops the activities and organizations namespaces
+    await invalidate_activity_caches()
+
+
 def seed_database():
     db = SessionLocal()
 
@@ -115,6 +126,9 @@ def seed_database():
                 for grandchild in child.children:
                     print(f"      - {grandchild.name} (id={grandchild.id}, level={grandchild.level})")
 
+        print("Clearing cached API responses...")
+        asyncio.run(clear_response_caches())
+
         print("\n✓ Database seeded successfully!")
 
     except Exception as e:
@@ -1,19 +1,28 @@
 """Pytest configuration and fixtures."""
 import os
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from fastapi_cache import FastAPICache
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import Connection, create_engine, event, insert, select
+from sqlalchemy.orm import ORMExecuteState, Session, raiseload
 from sqlalchemy.pool import StaticPool
 
+from app.api.organizations import bump_activity_version
 from app.core.config import settings
 from app.core.database import Base, get_db
 from app.main import app
-from app.models.models import Activity, Building, Organization
+from app.models.models import Activity, Building, Organization, organization_activity
 
-# Use in-memory SQLite for testing
+# Responses are always cached in process memory here: a REDIS_URL from the
+# environment or .env must not be required by, nor be wiped by, the test run
+settings.REDIS_URL = None
+
+# Use in-memory SQLite for testing. Every pytest-xdist worker is a separate
+# process, so each one gets its own private database without extra setup.
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
 engine = create_engine(
@@ -21,24 +30,59 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-@pytest.fixture(scope="function")
-def db() -> Generator[Session, None, None]:
-    """Create a fresh database session for each test."""
+# pysqlite manages transactions itself and breaks SAVEPOINT handling; let
+# SQLAlchemy emit BEGIN so tests can be rolled back to a savepoint
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+@pytest.fixture(scope="session")
+def connection() -> Generator[Connection, None, None]:
+    """Create the schema once and hold one outer transaction for the whole run."""
     Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
+    conn = engine.connect()
+    transaction = conn.begin()
+    try:
+        yield conn
+    finally:
+        transaction.rollback()
+        conn.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(connection: Connection) -> Generator[Session, None, None]:
+    """Create a database session whose changes are rolled back after the test."""
+    # The last test may have changed activities, drop descendant lookups it cached
+    bump_activity_version()
+    savepoint = connection.begin_nested()
+    # Commits inside the test only release inner savepoints of this one
+    session = Session(bind=connection, autoflush=False, join_transaction_mode="create_savepoint")
     try:
         yield session
     finally:
         session.close()
-        Base.metadata.drop_all(bind=engine)
+        savepoint.rollback()
+
+
+@pytest.fixture(scope="session")
+def app_client() -> Generator[TestClient, None, None]:
+    """Start the application once for the whole test run."""
+    with TestClient(app) as test_client:
+        yield test_client
 
 
 @pytest.fixture(scope="function")
-def client(db: Session) -> Generator[TestClient, None, None]:
-    """Create a test client with database override."""
+def client(app_client: TestClient, db: Session) -> Generator[TestClient, None, None]:
+    """Return the test client with the database overridden by this test's session."""
 
     def override_get_db():
         try:
@@ -47,108 +91,216 @@ def client(db: Session) -> Generator[TestClient, None, None]:
             pass
 
     app.dependency_overrides[get_db] = override_get_db
-    test_client = TestClient(app)
-    yield test_client
+    # Responses cached by an earlier test would outlive its rolled back data
+    app_client.portal.call(FastAPICache.clear)
+    yield app_client
     app.dependency_overrides.clear()
 
 
+@pytest_asyncio.fixture
+async def async_client(db: Session) -> AsyncGenerator[AsyncClient, None]:
+    """Create an async client calling the app in-process through ASGITransport."""
+
+    def override_get_db():
+        try:
+            yield db
+        finally:
+            pass
+
+    app.dependency_overrides[get_db] = override_get_db
+    # ASGITransport does not send lifespan events, run the startup code here
+    async with app.router.lifespan_context(app):
+        await FastAPICache.clear()
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as test_client:
+            yield test_client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+def sql_statements(db: Session) -> Generator[list[str], None, None]:
+    """Record SQL statements executed while the test runs; request it after data fixtures."""
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Savepoints come from the per-test rollback, not from the code under test
+        if not statement.startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
 @pytest.fixture(scope="function")
+def raise_on_lazy_load(db: Session) -> Generator[None, None, None]:
+    """Make lazy loads of instances queried in the test session raise instead of querying."""
+
+    def add_raiseload(execute_state: ORMExecuteState) -> None:
+        # Explicit eager loaders on the statement take precedence over the wildcard
+        if execute_state.is_select and not execute_state.is_relationship_load:
+            execute_state.statement = execute_state.statement.options(raiseload("*"))
+
+    event.listen(db, "do_orm_execute", add_raiseload)
+    try:
+        yield
+    finally:
+        event.remove(db, "do_orm_execute", add_raiseload)
+
+
+@pytest.fixture(scope="session")
 def auth_headers() -> dict:
-    """Return authentication headers with valid API key."""
+    """Return authentication headers with valid API key; shared, do not mutate."""
     return {"X-API-Key": settings.API_KEY}
 
 
-@pytest.fixture(scope="function")
-def sample_buildings(db: Session) -> list[Building]:
-    """Create sample buildings for testing."""
-    buildings = [
-        Building(
-            address="Москва, ул. Ленина, 1",
-            postcode="101000",
-            cadastral_number="77:01:0001001:1",
-            latitude=55.7558,
-            longitude=37.6173,
-        ),
-        Building(
-            address="Москва, ул. Пушкина, 10",
-            postcode="102000",
-            cadastral_number="77:01:0002001:1",
-            latitude=55.7600,
-            longitude=37.6200,
-        ),
-        Building(
-            address="Санкт-Петербург, Невский пр., 1",
-            postcode="190000",
-            cadastral_number="78:01:0001001:1",
-            latitude=59.9343,
-            longitude=30.3351,
-        ),
-    ]
-    for building in buildings:
-        db.add(building)
-    db.commit()
-    for building in buildings:
-        db.refresh(building)
-    return buildings
+def _load(db: Session, model: type[Base], ids: list[int]) -> list:
+    """Load seeded rows into the test session, keeping the seeding order."""
+    rows = {row.id: row for row in db.scalars(select(model).where(model.id.in_(ids)))}
+    return [rows[row_id] for row_id in ids]
 
 
-@pytest.fixture(scope="function")
-def sample_activities(db: Session) -> list[Activity]:
-    """Create sample hierarchical activities for testing."""
+def _insert(connection: Connection, model: type[Base], rows: list[dict]) -> list[int]:
+    """Insert rows in one statement and return their IDs in the order given."""
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(connection.execute(statement, rows).scalars())
+
+
+@pytest.fixture(scope="session")
+def seeded_buildings(connection: Connection) -> list[int]:
+    """Insert sample buildings once per test run and return their IDs."""
+    return _insert(
+        connection,
+        Building,
+        [
+            {
+                "address": "Москва, ул. Ленина, 1",
+                "postcode": "101000",
+                "cadastral_number": "77:01:0001001:1",
+                "latitude": 55.7558,
+                "longitude": 37.6173,
+            },
+            {
+                "address": "Москва, ул. Пушкина, 10",
+                "postcode": "102000",
+                "cadastral_number": "77:01:0002001:1",
+                "latitude": 55.7600,
+                "longitude": 37.6200,
+            },
+            {
+                "address": "Санкт-Петербург, Невский пр., 1",
+                "postcode": "190000",
+                "cadastral_number": "78:01:0001001:1",
+                "latitude": 59.9343,
+                "longitude": 30.3351,
+            },
+        ],
+    )
+
+
+@pytest.fixture(scope="session")
+def seeded_activities(connection: Connection) -> list[int]:
+    """Insert sample hierarchical activities once per test run and return their IDs."""
+    # One INSERT per level, children need the IDs returned for their parents
     # Level 1
-    food = Activity(name="Продукты питания", level=1)
-    db.add(food)
-    db.commit()
-    db.refresh(food)
+    [food] = _insert(
+        connection,
+        Activity,
+        [
+            {"name": "Продукты питания", "parent_id": None, "level": 1},
+        ],
+    )
 
     # Level 2
-    meat = Activity(name="Мясная продукция", parent_id=food.id, level=2)
-    dairy = Activity(name="Молочная продукция", parent_id=food.id, level=2)
-    db.add_all([meat, dairy])
-    db.commit()
-    db.refresh(meat)
-    db.refresh(dairy)
+    meat, dairy = _insert(
+        connection,
+        Activity,
+        [
+            {"name": "Мясная продукция", "parent_id": food, "level": 2},
+            {"name": "Молочная продукция", "parent_id": food, "level": 2},
+        ],
+    )
 
     # Level 3
-    beef = Activity(name="Говядина", parent_id=meat.id, level=3)
-    pork = Activity(name="Свинина", parent_id=meat.id, level=3)
-    db.add_all([beef, pork])
-    db.commit()
-    db.refresh(beef)
-    db.refresh(pork)
+    beef, pork = _insert(
+        connection,
+        Activity,
+        [
+            {"name": "Говядина", "parent_id": meat, "level": 3},
+            {"name": "Свинина", "parent_id": meat, "level": 3},
+        ],
+    )
 
     return [food, meat, dairy, beef, pork]
 
 
 @pytest.fixture(scope="function")
-def sample_organizations(
-    db: Session, sample_buildings: list[Building], sample_activities: list[Activity]
-) -> list[Organization]:
-    """Create sample organizations for testing."""
-    org1 = Organization(
-        name='ООО "Рога и Копыта"',
-        building_id=sample_buildings[0].id,
-        phones=["+7-495-123-45-67", "+7-495-765-43-21"],
-    )
-    org1.activities.extend([sample_activities[1], sample_activities[3]])  # meat, beef
+def sample_buildings(db: Session, seeded_buildings: list[int]) -> list[Building]:
+    """Return the sample buildings, loaded into the test session."""
+    return _load(db, Building, seeded_buildings)
 
-    org2 = Organization(
-        name='ИП "Молочный рай"',
-        building_id=sample_buildings[1].id,
-        phones=["+7-495-111-22-33"],
-    )
-    org2.activities.append(sample_activities[2])  # dairy
 
-    org3 = Organization(
-        name='АО "Универсал"',
-        building_id=sample_buildings[0].id,
-        phones=["+7-495-999-88-77"],
+@pytest.fixture(scope="function")
+def sample_activities(db: Session, seeded_activities: list[int]) -> list[Activity]:
+    """Return the sample activities (food, meat, dairy, beef, pork) loaded into the test session."""
+    return _load(db, Activity, seeded_activities)
+
+
+@pytest.fixture(scope="session")
+def seeded_organizations(
+    connection: Connection, seeded_buildings: list[int], seeded_activities: list[int]
+) -> list[int]:
+    """Insert sample organizations and their activities once per test run and return their IDs."""
+    first_building, second_building, _ = seeded_buildings
+    food, meat, dairy, beef, _ = seeded_activities
+    org1, org2, org3 = _insert(
+        connection,
+        Organization,
+        [
+            {
+                "name": 'ООО "Рога и Копыта"',
+                "building_id": first_building,
+                "phones": ["+7-495-123-45-67", "+7-495-765-43-21"],
+            },
+            {
+                "name": 'ИП "Молочный рай"',
+                "building_id": second_building,
+                "phones": ["+7-495-111-22-33"],
+            },
+            {
+                "name": 'АО "Универсал"',
+                "building_id": first_building,
+                "phones": ["+7-495-999-88-77"],
+            },
+        ],
     )
-    org3.activities.extend(sample_activities[:3])  # food, meat, dairy
 
-    db.add_all([org1, org2, org3])
-    db.commit()
-    for org in [org1, org2, org3]:
-        db.refresh(org)
+    connection.execute(
+        insert(organization_activity),
+        [
+            # org1: meat, beef
+            {"organization_id": org1, "activity_id": meat},
+            {"organization_id": org1, "activity_id": beef},
+            # org2: dairy
+            {"organization_id": org2, "activity_id": dairy},
+            # org3: food, meat, dairy
+            {"organization_id": org3, "activity_id": food},
+            {"organization_id": org3, "activity_id": meat},
+            {"organization_id": org3, "activity_id": dairy},
+        ],
+    )
 
     return [org1, org2, org3]
+
+
+@pytest.fixture(scope="function")
+def sample_organizations(
+    db: Session,
+    seeded_organizations: list[int],
+    sample_buildings: list[Building],
+    sample_activities: list[Activity],
+) -> list[Organization]:
+    """Return the sample organizations, loaded into the test session."""
+    return _load(db, Organization, seeded_organizations)
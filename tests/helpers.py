@@ -0,0 +1,10 @@
+"""Shared helpers for tests."""
+from typing import Any
+
+import orjson
+from httpx import Response
+
+
+def parse_json(response: Response) -> Any:
+    """Parse a response body with orjson, straight from the raw bytes."""
+    return orjson.loads(response.content)
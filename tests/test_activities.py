@@ -1,219 +1,238 @@
 """Tests for activity endpoints."""
 import pytest
-from fastapi.testclient import TestClient
+from fastapi_cache import FastAPICache
+from httpx import AsyncClient
 from sqlalchemy.orm import Session
 
+from app.api.organizations import invalidate_activity_caches
 from app.models.models import Activity
+from tests.helpers import parse_json
+
+pytestmark = pytest.mark.asyncio
 
 
 class TestActivitiesList:
     """Tests for GET /api/v1/activities endpoint."""
 
-    def test_get_all_activities(
+    async def test_get_all_activities(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test getting all activities."""
-        response = client.get("/api/v1/activities", headers=auth_headers)
+        response = await async_client.get("/api/v1/activities", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 5
         assert all(activity["name"] for activity in data)
         assert all(activity["level"] in [1, 2, 3] for activity in data)
 
-    def test_filter_by_name(
+    async def test_filter_by_name(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test filtering activities by name substring."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/activities?name=Мясная", headers=auth_headers
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 1
         assert "Мясная продукция" == data[0]["name"]
 
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/activities?name=продукция", headers=auth_headers
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 2  # "Мясная продукция" and "Молочная продукция"
 
-    def test_filter_by_parent_id(
+    async def test_filter_by_parent_id(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test filtering activities by parent_id."""
         food_id = sample_activities[0].id
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/activities?parent_id={food_id}", headers=auth_headers
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 2  # "Мясная" and "Молочная"
         assert all(activity["parent_id"] == food_id for activity in data)
 
         meat_id = sample_activities[1].id
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/activities?parent_id={meat_id}", headers=auth_headers
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 2  # "Говядина" and "Свинина"
 
-    def test_filter_by_level(
+    @pytest.mark.parametrize("level, expected_count", [(1, 1), (2, 2), (3, 2), (4, 0)])
+    async def test_filter_by_level(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
+        level: int,
+        expected_count: int,
     ):
         """Test filtering activities by level."""
-        response = client.get("/api/v1/activities?level=1", headers=auth_headers)
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 1
-        assert data[0]["level"] == 1
-
-        response = client.get("/api/v1/activities?level=2", headers=auth_headers)
+        response = await async_client.get(f"/api/v1/activities?level={level}", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 2
+        data = parse_json(response)
+        assert len(data) == expected_count
+        assert all(activity["level"] == level for activity in data)
 
-        response = client.get("/api/v1/activities?level=3", headers=auth_headers)
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 2
-
-    def test_get_root_activities(
+    async def test_get_root_activities(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test getting root-level activities (parent_id is null)."""
-        response = client.get("/api/v1/activities?level=1", headers=auth_headers)
+        response = await async_client.get("/api/v1/activities?level=1", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         for activity in data:
             assert activity["parent_id"] is None
 
-    def test_combined_filters(
+    async def test_combined_filters(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test combining multiple filters."""
         meat_id = sample_activities[1].id
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/activities?parent_id={meat_id}&level=3",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 2  # Both beef and pork are level 3 children of meat
 
+    async def test_include_tree(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        sample_activities: list[Activity],
+    ):
+        """Test getting activities as a nested tree."""
+        response = await async_client.get(
+            "/api/v1/activities?include_tree=true", headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = parse_json(response)
+        assert len(data) == 1  # Single root "Продукты питания"
+        root = data[0]
+        assert root["name"] == "Продукты питания"
+        assert {child["name"] for child in root["children"]} == {
+            "Мясная продукция",
+            "Молочная продукция",
+        }
+        meat = next(c for c in root["children"] if c["name"] == "Мясная продукция")
+        assert len(meat["children"]) == 2
+        assert all(grandchild["children"] == [] for grandchild in meat["children"])
+
 
 class TestActivityDetail:
     """Tests for GET /api/v1/activities/{id} endpoint."""
 
-    def test_get_activity_by_id(
+    async def test_get_activity_by_id(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test getting activity by ID."""
         activity_id = sample_activities[0].id
-        response = client.get(f"/api/v1/activities/{activity_id}", headers=auth_headers)
+        response = await async_client.get(f"/api/v1/activities/{activity_id}", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert data["id"] == activity_id
         assert data["name"] == "Продукты питания"
         assert data["level"] == 1
         assert data["parent_id"] is None
 
-    def test_get_child_activity(
+    async def test_get_child_activity(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test getting child activity with parent reference."""
         meat_id = sample_activities[1].id
-        response = client.get(f"/api/v1/activities/{meat_id}", headers=auth_headers)
+        response = await async_client.get(f"/api/v1/activities/{meat_id}", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert data["name"] == "Мясная продукция"
         assert data["level"] == 2
         assert data["parent_id"] == sample_activities[0].id
 
-    def test_get_nonexistent_activity(
-        self, client: TestClient, auth_headers: dict
+    async def test_child_activity_single_query(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        sample_activities: list[Activity],
+        sql_statements: list[str],
+    ):
+        """Test that a child activity is served without loading its ancestors."""
+        beef_id = sample_activities[3].id
+        issued = len(sql_statements)
+        response = await async_client.get(f"/api/v1/activities/{beef_id}", headers=auth_headers)
+        assert response.status_code == 200
+        assert len(sql_statements) == issued + 1
+
+    async def test_get_nonexistent_activity(
+        self, async_client: AsyncClient, auth_headers: dict
     ):
         """Test getting activity with non-existent ID."""
-        response = client.get("/api/v1/activities/99999", headers=auth_headers)
+        response = await async_client.get("/api/v1/activities/99999", headers=auth_headers)
         assert response.status_code == 404
-        assert "not found" in response.json()["detail"].lower()
+        assert "not found" in parse_json(response)["detail"].lower()
 
 
 class TestActivityHierarchy:
     """Tests for activity hierarchical structure."""
 
-    def test_three_level_hierarchy(
+    @pytest.mark.parametrize("level", [1, 2, 3])
+    async def test_three_level_hierarchy(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
+        level: int,
     ):
-        """Test that hierarchy has correct structure."""
-        # Level 1
-        response = client.get("/api/v1/activities?level=1", headers=auth_headers)
-        level1 = response.json()
-        assert len(level1) == 1
-        assert level1[0]["parent_id"] is None
-
-        # Level 2
-        response = client.get("/api/v1/activities?level=2", headers=auth_headers)
-        level2 = response.json()
-        assert len(level2) == 2
-        assert all(act["parent_id"] == level1[0]["id"] for act in level2)
-
-        # Level 3
-        response = client.get("/api/v1/activities?level=3", headers=auth_headers)
-        level3 = response.json()
-        assert len(level3) == 2
-        level2_ids = [act["id"] for act in level2]
-        assert all(act["parent_id"] in level2_ids for act in level3)
-
-    def test_max_three_levels(
+        """Test that every activity of a level hangs off an activity one level up."""
+        parent_ids = {act.id for act in sample_activities if act.level == level - 1} or {None}
+
+        response = await async_client.get(f"/api/v1/activities?level={level}", headers=auth_headers)
+        data = parse_json(response)
+        assert data
+        assert all(act["parent_id"] in parent_ids for act in data)
+
+    async def test_max_three_levels(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
-        """Test that no activities exist beyond level 3."""
-        response = client.get("/api/v1/activities?level=4", headers=auth_headers)
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 0
-
-        # Verify all activities are between 1 and 3
-        response = client.get("/api/v1/activities", headers=auth_headers)
-        data = response.json()
+        """Test that all activities are between level 1 and 3."""
+        response = await async_client.get("/api/v1/activities", headers=auth_headers)
+        data = parse_json(response)
         assert all(1 <= activity["level"] <= 3 for activity in data)
 
-    def test_parent_child_relationship(
+    async def test_parent_child_relationship(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
@@ -222,44 +241,43 @@ class TestActivityHierarchy:
         meat_id = sample_activities[1].id
         beef_id = sample_activities[3].id
 
-        # Get meat activity
-        response = client.get(f"/api/v1/activities/{meat_id}", headers=auth_headers)
-        meat = response.json()
-        assert meat["parent_id"] == food_id
-
-        # Get beef activity
-        response = client.get(f"/api/v1/activities/{beef_id}", headers=auth_headers)
-        beef = response.json()
-        assert beef["parent_id"] == meat_id
-
-        # Beef's grandparent should be food
-        # (This is implicit through the chain: beef -> meat -> food)
+        # Fetch the whole beef -> meat -> food chain in one request
+        response = await async_client.get(
+            "/api/v1/activities",
+            params=[("ids", food_id), ("ids", meat_id), ("ids", beef_id)],
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        by_id = {activity["id"]: activity for activity in parse_json(response)}
+        assert set(by_id) == {food_id, meat_id, beef_id}
+        assert by_id[meat_id]["parent_id"] == food_id
+        assert by_id[beef_id]["parent_id"] == meat_id
 
 
 class TestActivityValidation:
     """Tests for activity data validation."""
 
-    def test_empty_result(
-        self, client: TestClient, auth_headers: dict, sample_activities: list[Activity]
+    async def test_empty_result(
+        self, async_client: AsyncClient, auth_headers: dict, sample_activities: list[Activity]
     ):
         """Test response when no activities match filters."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/activities?name=НесуществующаяДеятельность",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        assert response.json() == []
+        assert parse_json(response) == []
 
-    def test_response_structure(
+    async def test_response_structure(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test that response has correct structure."""
-        response = client.get("/api/v1/activities", headers=auth_headers)
+        response = await async_client.get("/api/v1/activities", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
 
         for activity in data:
             assert "id" in activity
@@ -271,14 +289,75 @@ class TestActivityValidation:
             assert isinstance(activity["level"], int)
             assert activity["parent_id"] is None or isinstance(activity["parent_id"], int)
 
-    def test_unique_names(
+    async def test_unique_names(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test that all activity names are unique."""
-        response = client.get("/api/v1/activities", headers=auth_headers)
-        data = response.json()
+        response = await async_client.get("/api/v1/activities", headers=auth_headers)
+        data = parse_json(response)
         names = [activity["name"] for activity in data]
         assert len(names) == len(set(names))  # No duplicates
+
+
+class TestActivitiesCache:
+    """Tests for response caching of GET /api/v1/activities."""
+
+    async def test_tree_served_from_cache(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        sample_activities: list[Activity],
+        monkeypatch: pytest.MonkeyPatch,
+    ):
+        """Test that a repeated request is answered from the cache."""
+        monkeypatch.setattr(FastAPICache, "_enable", True)
+
+        first = await async_client.get("/api/v1/activities?include_tree=true", headers=auth_headers)
+        second = await async_client.get(
+            "/api/v1/activities?include_tree=true", headers=auth_headers
+        )
+
+        assert first.headers["X-FastAPI-Cache"] == "MISS"
+        assert second.headers["X-FastAPI-Cache"] == "HIT"
+        assert parse_json(second) == parse_json(first)
+        assert len(parse_json(second)[0]["children"]) == 2
+
+    async def test_invalidation_drops_cached_tree(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        sample_activities: list[Activity],
+        monkeypatch: pytest.MonkeyPatch,
+    ):
+        """Test that invalidating activity caches forces a fresh response."""
+        monkeypatch.setattr(FastAPICache, "_enable", True)
+
+        await async_client.get("/api/v1/activities?include_tree=true", headers=auth_headers)
+        await invalidate_activity_caches()
+        response = await async_client.get(
+            "/api/v1/activities?include_tree=true", headers=auth_headers
+        )
+
+        assert response.headers["X-FastAPI-Cache"] == "MISS"
+
+    async def test_matching_etag_returns_not_modified(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        sample_activities: list[Activity],
+        monkeypatch: pytest.MonkeyPatch,
+    ):
+        """Test that a client revalidating an unchanged list gets 304 without a body."""
+        monkeypatch.setattr(FastAPICache, "_enable", True)
+
+        first = await async_client.get("/api/v1/activities", headers=auth_headers)
+        revalidated = await async_client.get(
+            "/api/v1/activities", headers={**auth_headers, "If-None-Match": first.headers["ETag"]}
+        )
+
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["ETag"] == first.headers["ETag"]
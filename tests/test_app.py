@@ -0,0 +1,28 @@
+"""Tests for application setup."""
+from collections import Counter
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+class TestRouteTable:
+    """Tests for the routes registered on the application."""
+
+    def test_routes_registered_once(self):
+        """Test that every method and path pair is registered exactly once."""
+        routes = Counter(
+            (method, route.path)
+            for route in app.routes
+            if isinstance(route, APIRoute)
+            for method in route.methods
+        )
+        duplicates = [route for route, count in routes.items() if count > 1]
+        assert duplicates == []
+        assert ("GET", "/api/v1/organizations") in routes
+
+    def test_root_documented(self, client: TestClient):
+        """Test that the root endpoint works and is listed in the OpenAPI schema."""
+        assert client.get("/").status_code == 200
+        assert "/" in client.get("/openapi.json").json()["paths"]
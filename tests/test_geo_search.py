@@ -1,10 +1,21 @@
 """Tests for geo-search functionality."""
+import numpy as np
 import pytest
-from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Session
 
-from app.core.geo_utils import calculate_bounding_box, haversine_distance
-from app.models.models import Building
+from app.core.geo_queries import bbox_clauses, radius_clauses
+from app.core.geo_utils import (
+    calculate_bounding_box,
+    equirectangular_distance_batch,
+    haversine_distance,
+    haversine_distance_batch,
+)
+from app.core.geo_utils_fast import haversine_mask
+from app.models.models import Activity, Building, Organization
+from tests.helpers import parse_json
 
 
 class TestHaversineDistance:
@@ -42,6 +53,41 @@ class TestHaversineDistance:
         dist = haversine_distance(0, 0, 0, 1)
         assert 110000 < dist < 112000
 
+    def test_batch_matches_scalar(self):
+        """Test that the vectorized distance matches the scalar one."""
+        lats = np.array([55.7558, 55.7600, 59.9343, 0.0])
+        lons = np.array([37.6173, 37.6200, 30.3351, 0.0])
+        distances = haversine_distance_batch(55.7558, 37.6173, lats, lons)
+
+        expected = [
+            haversine_distance(55.7558, 37.6173, lat, lon)
+            for lat, lon in zip(lats, lons, strict=True)
+        ]
+        np.testing.assert_allclose(distances, expected, rtol=0, atol=0.001)
+
+    def test_mask_matches_batch(self):
+        """Test that the compiled radius mask agrees with the NumPy distances."""
+        rng = np.random.default_rng(0)
+        lats = rng.uniform(55.0, 56.5, 5000)
+        lons = rng.uniform(37.0, 38.5, 5000)
+        mask = haversine_mask(55.7558, 37.6173, lats, lons, 20000.0)
+        distances = haversine_distance_batch(55.7558, 37.6173, lats, lons)
+        # Ignore points within rounding error of the boundary
+        clear = np.abs(distances - 20000.0) > 1e-6
+
+        assert mask.dtype == np.bool_
+        assert np.array_equal(mask[clear], (distances <= 20000.0)[clear])
+
+    def test_equirectangular_close_to_haversine(self):
+        """Test that the planar approximation is accurate at city scale."""
+        lats = np.array([55.7558, 55.7600, 55.9000, 56.2000])
+        lons = np.array([37.6173, 37.6200, 37.9000, 37.6000])
+        approx = equirectangular_distance_batch(55.7558, 37.6173, lats, lons)
+        exact = haversine_distance_batch(55.7558, 37.6173, lats, lons)
+
+        assert approx[0] == 0.0
+        assert np.all(np.abs(approx - exact) < 1)
+
 
 class TestBoundingBox:
     """Tests for bounding box calculation."""
@@ -85,45 +131,95 @@ class TestBoundingBox:
         assert bbox_large["lon_max"] > bbox_small["lon_max"]
         assert bbox_large["lon_min"] < bbox_small["lon_min"]
 
+    def test_bounding_box_at_pole(self):
+        """Test that a box containing a pole spans all longitudes."""
+        bbox = calculate_bounding_box(90.0, 0.0, 1000000)
+
+        assert bbox["lat_max"] == 90.0
+        assert bbox["lon_min"] == -180.0
+        assert bbox["lon_max"] == 180.0
+
+
+class TestRadiusClauses:
+    """Tests for SQL radius filters."""
+
+    def test_postgresql_uses_st_dwithin(self):
+        """Test that PostgreSQL gets an exact, index-matching ST_DWithin filter."""
+        clauses, exact = radius_clauses("postgresql", 55.7558, 37.6173, 1000)
+        sql = str(
+            select(Building.id).where(*clauses).compile(dialect=postgresql.dialect())
+        )
+
+        assert exact
+        assert "ST_DWithin" in sql
+        assert "ST_MakePoint(buildings.longitude, buildings.latitude), 4326" in sql
+
+    def test_other_dialects_use_bounding_box(self):
+        """Test that other databases get a bounding-box prefilter."""
+        clauses, exact = radius_clauses("sqlite", 55.7558, 37.6173, 1000)
+
+        assert not exact
+        assert len(clauses) == 2
+
+
+class TestBoundingBoxClauses:
+    """Tests for SQL bounding-box filters."""
+
+    def test_postgresql_uses_point_containment(self):
+        """Test that PostgreSQL gets a containment test matching the GiST point index."""
+        clauses = bbox_clauses("postgresql", 55.7, 55.8, 37.5, 37.7)
+        sql = str(select(Building.id).where(*clauses).compile(dialect=postgresql.dialect()))
+
+        assert "point(buildings.longitude, buildings.latitude) <@ box(" in sql
+        # Ranges are kept so inverted boxes still match nothing
+        assert "BETWEEN" in sql
 
+    def test_other_dialects_use_ranges(self):
+        """Test that other databases get plain coordinate ranges."""
+        clauses = bbox_clauses("sqlite", 55.7, 55.8, 37.5, 37.7)
+
+        assert len(clauses) == 2
+
+
+@pytest.mark.asyncio
 class TestGeoSearchBuildings:
     """Tests for geo-search on buildings."""
 
-    def test_radius_search_all_within(
+    async def test_radius_search_all_within(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test radius search that includes all buildings."""
         # Search from Moscow with very large radius
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat=55.7558&lon=37.6173&radius=1000000",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 3  # All buildings
 
-    def test_radius_search_none_within(
+    async def test_radius_search_none_within(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test radius search with no buildings within range."""
         # Search from middle of nowhere with small radius
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat=0.0&lon=0.0&radius=1000",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 0
 
-    def test_radius_search_progressive(
+    async def test_radius_search_progressive(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
@@ -131,230 +227,258 @@ class TestGeoSearchBuildings:
         center_lat, center_lon = 55.7558, 37.6173
 
         # Very small radius
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/buildings?lat={center_lat}&lon={center_lon}&radius=10",
             headers=auth_headers,
         )
-        count_10m = len(response.json())
+        count_10m = len(parse_json(response))
 
         # Medium radius
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/buildings?lat={center_lat}&lon={center_lon}&radius=1000",
             headers=auth_headers,
         )
-        count_1km = len(response.json())
+        count_1km = len(parse_json(response))
 
         # Large radius
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/buildings?lat={center_lat}&lon={center_lon}&radius=10000",
             headers=auth_headers,
         )
-        count_10km = len(response.json())
+        count_10km = len(parse_json(response))
 
         # Each larger radius should include at least as many results
         assert count_10m <= count_1km <= count_10km
 
-    def test_bounding_box_moscow_only(
+    async def test_bounding_box_moscow_only(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test bounding box that includes only Moscow buildings."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat_min=55.7&lat_max=55.8&lon_min=37.5&lon_max=37.7",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 2  # Two Moscow buildings
         assert all("Москва" in b["address"] for b in data)
 
-    def test_bounding_box_spb_only(
+    async def test_bounding_box_spb_only(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test bounding box that includes only St. Petersburg buildings."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat_min=59.9&lat_max=60.0&lon_min=30.3&lon_max=30.4",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 1
         assert "Санкт-Петербург" in data[0]["address"]
 
-    def test_bounding_box_empty(
+    async def test_bounding_box_empty(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test bounding box with no buildings inside."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat_min=0.0&lat_max=1.0&lon_min=0.0&lon_max=1.0",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 0
 
 
+@pytest.mark.asyncio
 class TestGeoSearchOrganizations:
     """Tests for geo-search on organizations (through buildings)."""
 
-    def test_organizations_radius_search(
+    async def test_organizations_radius_search(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations,
         sample_buildings: list[Building],
     ):
         """Test radius search for organizations."""
         # Search near first Moscow building
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/organizations?lat=55.7558&lon=37.6173&radius=1000",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) > 0
         # All returned orgs should be in buildings within radius
 
-    def test_organizations_bounding_box(
+    async def test_organizations_bounding_box(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations,
     ):
         """Test bounding box search for organizations."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/organizations?lat_min=55.7&lat_max=55.8&lon_min=37.5&lon_max=37.7",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 3  # All orgs are in Moscow buildings
 
-    def test_combined_geo_and_activity_filter(
+    async def test_combined_geo_and_activity_filter(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations,
         sample_activities,
     ):
         """Test combining geo-search with activity filter."""
         meat_id = sample_activities[1].id  # "Мясная продукция"
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?lat=55.7558&lon=37.6173&radius=1000&activity_id={meat_id}",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         # Should return orgs with meat activities in Moscow
         assert len(data) > 0
 
 
+@pytest.mark.asyncio
 class TestGeoSearchEdgeCases:
     """Tests for edge cases in geo-search."""
 
-    def test_radius_zero(
+    async def test_radius_zero(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test radius search with zero radius."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat=55.7558&lon=37.6173&radius=0",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
-        # Zero radius should match nothing (or only exact coordinates)
-        assert len(data) == 0
-
-    def test_negative_radius(
+        data = parse_json(response)
+        # Zero radius matches only a building sitting exactly on the center
+        assert len(data) <= 1
+        for building in data:
+            assert building["latitude"] == 55.7558
+            assert building["longitude"] == 37.6173
+
+    async def test_negative_radius(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test that negative radius is handled."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat=55.7558&lon=37.6173&radius=-100",
             headers=auth_headers,
         )
         # Should either return 422 (validation error) or treat as no filter
         assert response.status_code in [200, 422]
 
-    def test_inverted_bounding_box(
+    async def test_inverted_bounding_box(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
+        sql_statements: list[str],
     ):
         """Test bounding box with min > max."""
-        response = client.get(
+        issued = len(sql_statements)
+        response = await async_client.get(
             "/api/v1/buildings?lat_min=60.0&lat_max=55.0&lon_min=40.0&lon_max=30.0",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
-        # Inverted box should match nothing
+        data = parse_json(response)
+        # Inverted box should match nothing, without querying the database
         assert len(data) == 0
+        assert len(sql_statements) == issued
+
+    async def test_inverted_bounding_box_with_activity_filter(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        sample_organizations: list[Organization],
+        sample_activities: list[Activity],
+        sql_statements: list[str],
+    ):
+        """Test that an inverted box skips even the activity descendant lookup."""
+        food_id = sample_activities[0].id
+        issued = len(sql_statements)
+        response = await async_client.get(
+            f"/api/v1/organizations?activity_id={food_id}"
+            "&lat_min=60.0&lat_max=55.0&lon_min=40.0&lon_max=30.0",
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert parse_json(response) == []
+        assert len(sql_statements) == issued
 
-    def test_extreme_coordinates(
+    async def test_extreme_coordinates(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test with extreme latitude/longitude values."""
         # North Pole
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat=90.0&lon=0.0&radius=1000000",
             headers=auth_headers,
         )
         assert response.status_code == 200
 
         # South Pole
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat=-90.0&lon=0.0&radius=1000000",
             headers=auth_headers,
         )
         assert response.status_code == 200
 
-    def test_partial_geo_params_radius(
+    async def test_partial_geo_params_radius(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test that incomplete radius params don't cause errors."""
         # Only lat and lon, no radius - should return all buildings
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat=55.7558&lon=37.6173",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 3  # No filtering applied
 
-    def test_partial_geo_params_bbox(
+    async def test_partial_geo_params_bbox(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
     ):
         """Test that incomplete bbox params don't cause errors."""
         # Only lat_min and lat_max, no lon params
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/buildings?lat_min=55.7&lat_max=55.8",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 3  # No filtering applied
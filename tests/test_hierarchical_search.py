@@ -1,9 +1,13 @@
 """Tests for hierarchical activity search functionality."""
 import pytest
-from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import DetachedInstanceError
 
+from app.api.organizations import bump_activity_version, get_activity_with_descendants
 from app.models.models import Activity, Building, Organization
+from tests.helpers import parse_json
 
 
 class TestActivityHierarchyHelpers:
@@ -43,69 +47,139 @@ class TestActivityHierarchyHelpers:
         for activity_id in all_ids:
             assert activity_id in descendants
 
+    def test_get_descendants_detached(
+        self, db: Session, sample_activities: list[Activity]
+    ):
+        """Test that a detached activity raises a clear error."""
+        food = sample_activities[0]
+        db.expunge(food)
+        with pytest.raises(DetachedInstanceError):
+            food.get_all_descendants()
+
 
+class TestDescendantLookupCache:
+    """Tests for the cached descendant lookup used by organization search."""
+
+    def test_lookup_cached_until_version_bump(
+        self, db: Session, sample_activities: list[Activity], sql_statements: list[str]
+    ):
+        """Test that repeated lookups skip the database until the tree changes."""
+        food_id = sample_activities[0].id  # may itself refresh the expired instance
+        issued = len(sql_statements)
+        first = get_activity_with_descendants(db, food_id)
+        second = get_activity_with_descendants(db, food_id)
+        assert len(sql_statements) == issued + 1
+
+        bump_activity_version()
+        third = get_activity_with_descendants(db, food_id)
+        assert len(sql_statements) == issued + 2
+
+        assert sorted(first) == sorted(act.id for act in sample_activities)
+        assert first == second == third
+
+    def test_committed_activity_change_drops_lookups(
+        self, db: Session, sample_activities: list[Activity]
+    ):
+        """Test that committing a new activity through the ORM invalidates cached lookups."""
+        food_id = sample_activities[0].id
+        before = get_activity_with_descendants(db, food_id)
+
+        veal = Activity(name="Телятина", parent_id=sample_activities[1].id, level=3)
+        db.add(veal)
+        db.flush()
+        # Not committed yet, the cached lookup is still served
+        assert get_activity_with_descendants(db, food_id) == before
+
+        db.commit()
+        assert veal.id in get_activity_with_descendants(db, food_id)
+
+
+@pytest.mark.asyncio
 class TestHierarchicalOrganizationSearch:
     """Tests for hierarchical search in organization endpoints."""
 
-    def test_search_by_root_returns_all(
+    async def test_search_by_root_returns_all(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations: list[Organization],
         sample_activities: list[Activity],
     ):
         """Test searching by root activity returns all matching organizations."""
         food_id = sample_activities[0].id  # "Продукты питания"
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?activity_id={food_id}",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         # All 3 orgs have activities under "Продукты питания"
         assert len(data) == 3
 
-    def test_search_by_middle_level(
+    async def test_filter_uses_association_semi_join(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        sample_organizations: list[Organization],
+        sample_activities: list[Activity],
+        sql_statements: list[str],
+    ):
+        """Test that the activity filter is an EXISTS on the association table only."""
+        food_id = sample_activities[0].id
+        issued = len(sql_statements)
+        response = await async_client.get(
+            f"/api/v1/organizations?activity_id={food_id}",
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+
+        statement = next(sql for sql in sql_statements[issued:] if "EXISTS" in sql)
+        semi_join = statement.split("EXISTS", 1)[1]
+        assert "FROM organization_activity" in semi_join
+        assert "activities" not in semi_join
+        assert "DISTINCT" not in statement
+
+    async def test_search_by_middle_level(
+        self,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations: list[Organization],
         sample_activities: list[Activity],
     ):
         """Test searching by middle-level activity."""
         meat_id = sample_activities[1].id  # "Мясная продукция"
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?activity_id={meat_id}",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         # org1 has "Мясная" and "Говядина"
         # org3 has "Мясная"
         assert len(data) == 2
 
-    def test_search_by_leaf_specific(
+    async def test_search_by_leaf_specific(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations: list[Organization],
         sample_activities: list[Activity],
     ):
         """Test searching by leaf activity returns only specific orgs."""
         beef_id = sample_activities[3].id  # "Говядина"
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?activity_id={beef_id}",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         # Only org1 has "Говядина"
         assert len(data) == 1
         assert "Рога и Копыта" in data[0]["name"]
 
-    def test_search_by_different_branches(
+    async def test_search_by_different_branches(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations: list[Organization],
         sample_activities: list[Activity],
@@ -115,18 +189,18 @@ class TestHierarchicalOrganizationSearch:
         dairy_id = sample_activities[2].id  # "Молочная продукция"
 
         # Search meat branch
-        response_meat = client.get(
+        response_meat = await async_client.get(
             f"/api/v1/organizations?activity_id={meat_id}",
             headers=auth_headers,
         )
-        meat_orgs = response_meat.json()
+        meat_orgs = parse_json(response_meat)
 
         # Search dairy branch
-        response_dairy = client.get(
+        response_dairy = await async_client.get(
             f"/api/v1/organizations?activity_id={dairy_id}",
             headers=auth_headers,
         )
-        dairy_orgs = response_dairy.json()
+        dairy_orgs = parse_json(response_dairy)
 
         # Results should be different
         meat_ids = {org["id"] for org in meat_orgs}
@@ -139,28 +213,29 @@ class TestHierarchicalOrganizationSearch:
         assert universal_in_meat and universal_in_dairy
 
 
+@pytest.mark.asyncio
 class TestHierarchicalSearchEdgeCases:
     """Tests for edge cases in hierarchical search."""
 
-    def test_nonexistent_activity_returns_empty(
+    async def test_nonexistent_activity_returns_empty(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations: list[Organization],
     ):
         """Test searching by non-existent activity ID."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/organizations?activity_id=99999",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 0
 
-    def test_org_with_multiple_activities_from_same_tree(
+    async def test_org_with_multiple_activities_from_same_tree(
         self,
         db: Session,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
         sample_activities: list[Activity],
@@ -179,18 +254,18 @@ class TestHierarchicalSearchEdgeCases:
         db.commit()
 
         # Search by parent should still return org once (not duplicated)
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?activity_id={meat.id}",
             headers=auth_headers,
         )
-        data = response.json()
+        data = parse_json(response)
         test_orgs = [o for o in data if o["name"] == "Тестовая организация"]
         assert len(test_orgs) == 1
 
-    def test_org_without_activities(
+    async def test_org_without_activities(
         self,
         db: Session,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_buildings: list[Building],
         sample_activities: list[Activity],
@@ -207,20 +282,21 @@ class TestHierarchicalSearchEdgeCases:
 
         # Search by any activity should not return this org
         food_id = sample_activities[0].id
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?activity_id={food_id}",
             headers=auth_headers,
         )
-        data = response.json()
+        data = parse_json(response)
         assert not any(o["name"] == "Организация без деятельности" for o in data)
 
 
+@pytest.mark.asyncio
 class TestComplexHierarchicalScenarios:
     """Tests for complex hierarchical search scenarios."""
 
-    def test_three_level_hierarchy_search(
+    async def test_three_level_hierarchy_search(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations: list[Organization],
         sample_activities: list[Activity],
@@ -231,25 +307,25 @@ class TestComplexHierarchicalScenarios:
         beef = sample_activities[3]  # Level 3
 
         # Search by level 1 (root)
-        response_l1 = client.get(
+        response_l1 = await async_client.get(
             f"/api/v1/organizations?activity_id={food.id}",
             headers=auth_headers,
         )
-        orgs_l1 = set(o["id"] for o in response_l1.json())
+        orgs_l1 = set(o["id"] for o in parse_json(response_l1))
 
         # Search by level 2
-        response_l2 = client.get(
+        response_l2 = await async_client.get(
             f"/api/v1/organizations?activity_id={meat.id}",
             headers=auth_headers,
         )
-        orgs_l2 = set(o["id"] for o in response_l2.json())
+        orgs_l2 = set(o["id"] for o in parse_json(response_l2))
 
         # Search by level 3
-        response_l3 = client.get(
+        response_l3 = await async_client.get(
             f"/api/v1/organizations?activity_id={beef.id}",
             headers=auth_headers,
         )
-        orgs_l3 = set(o["id"] for o in response_l3.json())
+        orgs_l3 = set(o["id"] for o in parse_json(response_l3))
 
         # Level 1 should include all from level 2 and 3
         assert orgs_l2.issubset(orgs_l1)
@@ -257,9 +333,9 @@ class TestComplexHierarchicalScenarios:
         # Level 2 should include all from level 3
         assert orgs_l3.issubset(orgs_l2)
 
-    def test_sibling_activities_independent(
+    async def test_sibling_activities_independent(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations: list[Organization],
         sample_activities: list[Activity],
@@ -269,27 +345,27 @@ class TestComplexHierarchicalScenarios:
         pork_id = sample_activities[4].id  # "Свинина"
 
         # Search by beef
-        response_beef = client.get(
+        response_beef = await async_client.get(
             f"/api/v1/organizations?activity_id={beef_id}",
             headers=auth_headers,
         )
-        beef_orgs = set(o["id"] for o in response_beef.json())
+        beef_orgs = set(o["id"] for o in parse_json(response_beef))
 
         # Search by pork
-        response_pork = client.get(
+        response_pork = await async_client.get(
             f"/api/v1/organizations?activity_id={pork_id}",
             headers=auth_headers,
         )
-        pork_orgs = set(o["id"] for o in response_pork.json())
+        pork_orgs = set(o["id"] for o in parse_json(response_pork))
 
         # Results should be independent (different orgs)
         # beef_orgs and pork_orgs should have no overlap
         # (based on our sample data, org1 only has beef, no one has pork alone)
         assert len(beef_orgs) > 0  # org1 has beef
 
-    def test_combining_hierarchy_with_other_filters(
+    async def test_combining_hierarchy_with_other_filters(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_organizations: list[Organization],
         sample_activities: list[Activity],
@@ -300,28 +376,29 @@ class TestComplexHierarchicalScenarios:
         building_id = sample_buildings[0].id
 
         # Hierarchical + building filter
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?activity_id={meat_id}&building_id={building_id}",
             headers=auth_headers,
         )
-        data = response.json()
+        data = parse_json(response)
         assert len(data) > 0
         # All results should be in the specified building
         assert all(org["building"]["id"] == building_id for org in data)
 
         # Hierarchical + geo filter
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?activity_id={meat_id}&lat=55.7558&lon=37.6173&radius=1000",
             headers=auth_headers,
         )
-        data = response.json()
+        data = parse_json(response)
         assert len(data) > 0
 
-    def test_multiple_orgs_same_leaf_activity(
+    async def test_multiple_orgs_same_leaf_activity(
         self,
         db: Session,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
+        sample_organizations: list[Organization],
         sample_buildings: list[Building],
         sample_activities: list[Activity],
     ):
@@ -338,11 +415,11 @@ class TestComplexHierarchicalScenarios:
         db.commit()
 
         # Search by beef should now return 2 orgs
-        response = client.get(
+        response = await async_client.get(
             f"/api/v1/organizations?activity_id={beef.id}",
             headers=auth_headers,
         )
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 2  # org1 ("Рога и Копыта") + new org
         names = {org["name"] for org in data}
         assert "Рога и Копыта" in str(names)
@@ -352,15 +429,16 @@ class TestComplexHierarchicalScenarios:
 class TestHierarchyConsistency:
     """Tests to ensure hierarchy consistency is maintained."""
 
-    def test_activity_levels_consistent(
+    @pytest.mark.asyncio
+    async def test_activity_levels_consistent(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
         sample_activities: list[Activity],
     ):
         """Test that activity levels are consistent with parent relationships."""
-        response = client.get("/api/v1/activities", headers=auth_headers)
-        activities = response.json()
+        response = await async_client.get("/api/v1/activities", headers=auth_headers)
+        activities = parse_json(response)
 
         for activity in activities:
             if activity["parent_id"] is None:
@@ -380,28 +458,22 @@ class TestHierarchyConsistency:
         sample_activities: list[Activity],
     ):
         """Test that there are no circular references in hierarchy."""
-        visited = set()
-
-        def check_ancestry(activity: Activity, ancestors: set):
-            if activity.id in ancestors:
-                # Circular reference detected
-                return False
-            if activity.id in visited:
-                # Already checked this branch
-                return True
-
-            visited.add(activity.id)
-            if activity.parent_id is None:
-                return True
-
-            parent = db.query(Activity).filter_by(id=activity.parent_id).first()
-            if parent is None:
-                return False
-
-            new_ancestors = ancestors.copy()
-            new_ancestors.add(activity.id)
-            return check_ancestry(parent, new_ancestors)
+        parents = dict(db.execute(select(Activity.id, Activity.parent_id)).all())
+
+        def check_ancestry(activity: Activity) -> bool:
+            seen = set()
+            current = activity.id
+            while current is not None:
+                if current in seen:
+                    # Circular reference detected
+                    return False
+                if current not in parents:
+                    # Dangling parent_id
+                    return False
+                seen.add(current)
+                current = parents[current]
+            return True
 
         # Check all activities
         for activity in sample_activities:
-            assert check_ancestry(activity, set()), f"Circular reference in activity {activity.id}"
+            assert check_ancestry(activity), f"Circular reference in activity {activity.id}"
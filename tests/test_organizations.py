@@ -1,257 +1,260 @@
 """Tests for organization endpoints."""
+from typing import Optional
+
 import pytest
-from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
-from app.models.models import Activity, Building, Organization
+from app.schemas.schemas import OrganizationDetailSchema
+from tests.helpers import parse_json
+
+pytestmark = pytest.mark.asyncio
+
+_organizations_adapter = TypeAdapter(list[OrganizationDetailSchema])
 
 
 class TestOrganizationsList:
     """Tests for GET /api/v1/organizations endpoint."""
 
-    def test_get_all_organizations(
+    async def test_get_all_organizations(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
-        sample_organizations: list[Organization],
+        seeded_organizations: list[int],
     ):
         """Test getting all organizations."""
-        response = client.get("/api/v1/organizations", headers=auth_headers)
+        response = await async_client.get("/api/v1/organizations", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert len(data) == 3
         assert all(org["name"] for org in data)
         assert all(org["building"] for org in data)
 
-    def test_filter_by_building(
-        self,
-        client: TestClient,
-        auth_headers: dict,
-        sample_organizations: list[Organization],
-        sample_buildings: list[Building],
-    ):
-        """Test filtering organizations by building_id."""
-        building_id = sample_buildings[0].id
-        response = client.get(
-            f"/api/v1/organizations?building_id={building_id}", headers=auth_headers
-        )
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 2  # org1 and org3 are in building 0
-        assert all(org["building"]["id"] == building_id for org in data)
-
-    def test_filter_by_name(
+    @pytest.mark.parametrize(
+        "building_index, activity_index, name, expected_orgs",
+        [
+            (0, None, None, [0, 2]),  # org1 and org3 are in building 0
+            (None, None, "Рога", [0]),
+            (None, 0, None, [0, 1, 2]),  # "Продукты питания" includes all descendants
+            (None, 3, None, [0]),  # only org1 has "Говядина"
+            (0, 1, None, [0, 2]),  # org1 and org3 in building 0 with meat activities
+        ],
+        ids=["building", "name", "activity-parent", "activity-child", "combined"],
+    )
+    async def test_filters(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
-        sample_organizations: list[Organization],
+        seeded_organizations: list[int],
+        seeded_buildings: list[int],
+        seeded_activities: list[int],
+        building_index: Optional[int],
+        activity_index: Optional[int],
+        name: Optional[str],
+        expected_orgs: list[int],
     ):
-        """Test filtering organizations by name substring."""
-        response = client.get('/api/v1/organizations?name=Рога', headers=auth_headers)
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 1
-        assert "Рога и Копыта" in data[0]["name"]
+        """Test that each filter, alone or combined, returns exactly the matching organizations."""
+        params = {}
+        if building_index is not None:
+            params["building_id"] = seeded_buildings[building_index]
+        if activity_index is not None:
+            params["activity_id"] = seeded_activities[activity_index]
+        if name is not None:
+            params["name"] = name
 
-    def test_filter_by_activity_parent(
-        self,
-        client: TestClient,
-        auth_headers: dict,
-        sample_organizations: list[Organization],
-        sample_activities: list[Activity],
-    ):
-        """Test hierarchical activity search - searching by parent returns descendants."""
-        food_id = sample_activities[0].id  # "Продукты питания" (parent)
-        response = client.get(
-            f"/api/v1/organizations?activity_id={food_id}", headers=auth_headers
+        response = await async_client.get(
+            "/api/v1/organizations", params=params, headers=auth_headers
         )
         assert response.status_code == 200
-        data = response.json()
-        # All 3 organizations have activities under "Продукты питания"
-        assert len(data) == 3
-
-    def test_filter_by_activity_child(
-        self,
-        client: TestClient,
-        auth_headers: dict,
-        sample_organizations: list[Organization],
-        sample_activities: list[Activity],
-    ):
-        """Test filtering by specific child activity."""
-        beef_id = sample_activities[3].id  # "Говядина" (child)
-        response = client.get(
-            f"/api/v1/organizations?activity_id={beef_id}", headers=auth_headers
+        data = parse_json(response)
+        assert sorted(org["id"] for org in data) == sorted(
+            seeded_organizations[index] for index in expected_orgs
         )
-        assert response.status_code == 200
-        data = response.json()
-        # Only org1 has "Говядина"
-        assert len(data) == 1
-        assert "Рога и Копыта" in data[0]["name"]
 
-    def test_geo_search_radius(
+    @pytest.mark.parametrize(
+        "radius, expected_count",
+        [
+            (1000, 3),  # building[1] is ~500m away: all 3 orgs in Moscow buildings (0 and 1)
+            (100, 2),  # only orgs in building[0]
+        ],
+    )
+    async def test_geo_search_radius(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
-        sample_organizations: list[Organization],
-        sample_buildings: list[Building],
+        seeded_organizations: list[int],
+        radius: int,
+        expected_count: int,
     ):
-        """Test geo-search by radius."""
-        # Search near building[0]: lat=55.7558, lon=37.6173
-        # building[1] is very close (lat=55.7600, lon=37.6200) ~500m
+        """Test geo-search by radius around building[0]."""
         # building[2] is in St. Petersburg, very far away
-        response = client.get(
-            "/api/v1/organizations?lat=55.7558&lon=37.6173&radius=1000",
-            headers=auth_headers,
-        )
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 3  # All 3 orgs in Moscow buildings (0 and 1)
-
-        # Smaller radius - only building[0]
-        response = client.get(
-            "/api/v1/organizations?lat=55.7558&lon=37.6173&radius=100",
+        response = await async_client.get(
+            f"/api/v1/organizations?lat=55.7558&lon=37.6173&radius={radius}",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 2  # Only orgs in building[0]
+        data = parse_json(response)
+        assert len(data) == expected_count
 
-    def test_geo_search_bounding_box(
+    @pytest.mark.parametrize(
+        "box, expected_count",
+        [
+            ("lat_min=55.7&lat_max=55.8&lon_min=37.5&lon_max=37.7", 3),  # Moscow only
+            ("lat_min=50.0&lat_max=50.1&lon_min=30.0&lon_max=30.1", 0),  # excludes everything
+        ],
+        ids=["moscow", "empty"],
+    )
+    async def test_geo_search_bounding_box(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
-        sample_organizations: list[Organization],
+        seeded_organizations: list[int],
+        box: str,
+        expected_count: int,
     ):
         """Test geo-search by bounding box."""
-        # Box around Moscow only
-        response = client.get(
-            "/api/v1/organizations?lat_min=55.7&lat_max=55.8&lon_min=37.5&lon_max=37.7",
-            headers=auth_headers,
-        )
+        response = await async_client.get(f"/api/v1/organizations?{box}", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 3  # All 3 orgs are in Moscow
-
-        # Box that excludes everything
-        response = client.get(
-            "/api/v1/organizations?lat_min=50.0&lat_max=50.1&lon_min=30.0&lon_max=30.1",
-            headers=auth_headers,
-        )
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 0
-
-    def test_combined_filters(
-        self,
-        client: TestClient,
-        auth_headers: dict,
-        sample_organizations: list[Organization],
-        sample_buildings: list[Building],
-        sample_activities: list[Activity],
-    ):
-        """Test combining multiple filters."""
-        building_id = sample_buildings[0].id
-        meat_id = sample_activities[1].id  # "Мясная продукция"
-        response = client.get(
-            f"/api/v1/organizations?building_id={building_id}&activity_id={meat_id}",
-            headers=auth_headers,
-        )
-        assert response.status_code == 200
-        data = response.json()
-        assert len(data) == 2  # org1 and org3 in building[0] with meat activities
+        data = parse_json(response)
+        assert len(data) == expected_count
 
 
 class TestOrganizationDetail:
     """Tests for GET /api/v1/organizations/{id} endpoint."""
 
-    def test_get_organization_by_id(
+    async def test_get_organization_by_id(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
-        sample_organizations: list[Organization],
+        seeded_organizations: list[int],
     ):
         """Test getting organization by ID."""
-        org_id = sample_organizations[0].id
-        response = client.get(f"/api/v1/organizations/{org_id}", headers=auth_headers)
+        org_id = seeded_organizations[0]
+        response = await async_client.get(f"/api/v1/organizations/{org_id}", headers=auth_headers)
         assert response.status_code == 200
-        data = response.json()
+        data = parse_json(response)
         assert data["id"] == org_id
         assert "Рога и Копыта" in data["name"]
         assert data["building"] is not None
         assert len(data["activities"]) > 0
         assert len(data["phones"]) == 2
 
-    def test_get_nonexistent_organization(
-        self, client: TestClient, auth_headers: dict
+    async def test_get_nonexistent_organization(
+        self, async_client: AsyncClient, auth_headers: dict
     ):
         """Test getting organization with non-existent ID."""
-        response = client.get("/api/v1/organizations/99999", headers=auth_headers)
+        response = await async_client.get("/api/v1/organizations/99999", headers=auth_headers)
         assert response.status_code == 404
-        assert "not found" in response.json()["detail"].lower()
+        assert "not found" in parse_json(response)["detail"].lower()
 
 
 class TestOrganizationValidation:
     """Tests for organization data validation."""
 
-    def test_empty_result(
-        self, client: TestClient, auth_headers: dict, db: Session
+    async def test_empty_result(
+        self, async_client: AsyncClient, auth_headers: dict, db: Session
     ):
         """Test response when no organizations match filters."""
-        response = client.get(
+        response = await async_client.get(
             "/api/v1/organizations?name=НесуществующаяОрганизация",
             headers=auth_headers,
         )
         assert response.status_code == 200
-        assert response.json() == []
+        assert parse_json(response) == []
 
-    def test_geo_search_validation(
+    @pytest.mark.parametrize(
+        "partial_params",
+        [
+            "lat=55.7558&lon=37.6173",  # radius search requires lat, lon, and radius
+            "lat_min=55.7&lat_max=55.8",  # bounding box requires all 4 parameters
+        ],
+        ids=["radius", "bbox"],
+    )
+    async def test_geo_search_validation(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
-        sample_organizations: list[Organization],
+        seeded_organizations: list[int],
+        partial_params: str,
     ):
-        """Test that geo-search requires complete parameters."""
-        # Radius search requires lat, lon, and radius
-        response = client.get(
-            "/api/v1/organizations?lat=55.7558&lon=37.6173", headers=auth_headers
+        """Test that incomplete geo-search parameters are ignored rather than rejected."""
+        response = await async_client.get(
+            f"/api/v1/organizations?{partial_params}", headers=auth_headers
         )
         assert response.status_code == 200  # Should work, just no geo-filtering
+        assert len(parse_json(response)) == 3
 
-        # Bounding box requires all 4 parameters
-        response = client.get(
-            "/api/v1/organizations?lat_min=55.7&lat_max=55.8", headers=auth_headers
-        )
-        assert response.status_code == 200  # Should work, just no geo-filtering
-
-    def test_response_structure(
+    async def test_response_structure(
         self,
-        client: TestClient,
+        async_client: AsyncClient,
         auth_headers: dict,
-        sample_organizations: list[Organization],
+        seeded_organizations: list[int],
     ):
         """Test that response has correct structure."""
-        response = client.get("/api/v1/organizations", headers=auth_headers)
+        response = await async_client.get("/api/v1/organizations", headers=auth_headers)
+        assert response.status_code == 200
+
+        organizations = _organizations_adapter.validate_json(response.content, strict=True)
+        assert len(organizations) == 3
+        assert all(org.phones is not None for org in organizations)
+        # A field missing from the body would come back filled with its default
+        dumped = _organizations_adapter.dump_python(organizations, mode="json")
+        assert dumped == parse_json(response)
+
+
+class TestOrganizationQueries:
+    """Tests for the SQL issued by organization endpoints."""
+
+    async def test_list_eager_loads_relationships(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        db: Session,
+        seeded_organizations: list[int],
+        sql_statements: list[str],
+        raise_on_lazy_load: None,
+    ):
+        """Test that the list endpoint does not lazy-load building or activities."""
+        db.expunge_all()
+        response = await async_client.get("/api/v1/organizations", headers=auth_headers)
+
         assert response.status_code == 200
-        data = response.json()
+        assert len(parse_json(response)) == 3
+        # One query for organizations joined with buildings, one for activities
+        assert len(sql_statements) == 2
 
-        for org in data:
-            assert "id" in org
-            assert "name" in org
-            assert "phones" in org
-            assert isinstance(org["phones"], list)
-            assert "building" in org
-            assert "activities" in org
-            assert isinstance(org["activities"], list)
+    async def test_detail_eager_loads_relationships(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        db: Session,
+        seeded_organizations: list[int],
+        raise_on_lazy_load: None,
+    ):
+        """Test that the detail endpoint does not lazy-load building or activities."""
+        org_id = seeded_organizations[0]
+        db.expunge_all()
+        response = await async_client.get(f"/api/v1/organizations/{org_id}", headers=auth_headers)
 
-            # Check building structure
-            building = org["building"]
-            assert "id" in building
-            assert "address" in building
-            assert "latitude" in building
-            assert "longitude" in building
+        assert response.status_code == 200
+        assert len(parse_json(response)["activities"]) == 2
 
-            # Check activities structure
-            for activity in org["activities"]:
-                assert "id" in activity
-                assert "name" in activity
-                assert "level" in activity
+    async def test_radius_search_prefilters_with_bounding_box(
+        self,
+        async_client: AsyncClient,
+        auth_headers: dict,
+        seeded_organizations: list[int],
+        sql_statements: list[str],
+    ):
+        """Test that radius search narrows candidates with index-friendly coordinate ranges."""
+        response = await async_client.get(
+            "/api/v1/organizations?lat=55.7558&lon=37.6173&radius=100",
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 200
+        assert len(parse_json(response)) == 2
+        statement = next(sql for sql in sql_statements if "JOIN buildings" in sql)
+        assert "buildings.latitude BETWEEN" in statement
+        assert "buildings.longitude BETWEEN" in statement